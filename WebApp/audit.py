@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from WebApp.logic import VoyageState
+
+# Fleet-wide audit: replays every stored history through the same rules that
+# /check_contradiction applies to a single new entry, and reports each row
+# that would have been flagged. As in bulk import, status contradictions are
+# warnings, not violations. Vessels are independent, so chunks of them are
+# audited in parallel worker processes.
+
+AUDIT_CHUNK_SIZE = 50
+AUDIT_MAX_WORKERS = os.cpu_count() or 1
+
+# Rows cross the process boundary as (iso date, laden/ballast, report type)
+VesselRows = Tuple[str, List[Tuple[str, str, str]]]
+
+def audit_history(vessel_name: str, rows: Sequence[Tuple[str, str, str]]) -> List[Dict]:
+    violations = []
+    state = VoyageState()
+    for row_date, laden_ballast, report_type in rows:
+        is_seq_valid, seq_reason = state.check_report_sequence(report_type)
+        is_laden_valid, laden_reason = state.check_laden_ballast_change(laden_ballast, report_type)
+        is_contradiction, _, reason = state.check_for_contradiction(laden_ballast, report_type)
+        for failed, rule, severity, message in (
+            (not is_seq_valid, 'report_sequence', 'violation', seq_reason),
+            (not is_laden_valid, 'laden_ballast_change', 'violation', laden_reason),
+            (is_contradiction, 'status_contradiction', 'warning', reason),
+        ):
+            if failed:
+                violations.append({
+                    'vessel': vessel_name,
+                    'date': row_date,
+                    'report_type': report_type,
+                    'laden_ballast': laden_ballast,
+                    'rule': rule,
+                    'severity': severity,
+                    'reason': message,
+                })
+        state = state.advance({'Laden_Ballst': laden_ballast, 'Report_Type': report_type})
+    return violations
+
+def _audit_chunk(chunk: List[VesselRows]) -> Tuple[int, List[Dict]]:
+    return len(chunk), [v for vessel_name, rows in chunk for v in audit_history(vessel_name, rows)]
+
+def changed_vessels(snapshot, since: Optional[int] = None, vessels: Optional[Iterable[str]] = None) -> List[str]:
+    names = snapshot.vessels if vessels is None else [v for v in vessels if v in snapshot.vessels]
+    return sorted(name for name in names if since is None or snapshot.vessels[name].revision > since)
+
+def _chunk(snapshot, names: List[str]) -> List[VesselRows]:
+    return [
+        (name, [(row['Date'].isoformat(), row['Laden_Ballst'], row['Report_Type']) for row in snapshot.vessels[name].rows])
+        for name in names
+    ]
+
+def _chunks(snapshot, names: List[str], chunk_size: int) -> Iterator[List[VesselRows]]:
+    for i in range(0, len(names), chunk_size):
+        yield _chunk(snapshot, names[i:i + chunk_size])
+
+def _audit_names(snapshot, names: List[str]) -> List[Dict]:
+    return _audit_chunk(_chunk(snapshot, names))[1]
+
+def _executor(workers: Optional[int]) -> ProcessPoolExecutor:
+    # Spawned workers only import the validators, never the app or its storage
+    return ProcessPoolExecutor(max_workers=workers or AUDIT_MAX_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+
+def run_audit(snapshot, names: List[str], workers: Optional[int] = None, chunk_size: int = AUDIT_CHUNK_SIZE) -> Iterator[Dict]:
+    if len(names) <= chunk_size or workers == 1:
+        for chunk in _chunks(snapshot, names, chunk_size):
+            yield from _audit_chunk(chunk)[1]
+        return
+    with _executor(workers) as pool:
+        for _, violations in pool.map(_audit_chunk, _chunks(snapshot, names, chunk_size)):
+            yield from violations
+
+async def run_audit_async(snapshot, names: List[str], workers: Optional[int] = None, chunk_size: int = AUDIT_CHUNK_SIZE):
+    # Yields violations chunk by chunk as they are finished. Nothing runs on the
+    # event loop: small audits use a thread, larger ones worker processes fed
+    # a few chunks at a time, with rows extracted in a thread as well.
+    loop = asyncio.get_running_loop()
+    starts = range(0, len(names), chunk_size)
+    if len(names) <= chunk_size or workers == 1:
+        for start in starts:
+            for violation in await loop.run_in_executor(None, _audit_names, snapshot, names[start:start + chunk_size]):
+                yield violation
+        return
+    pool = _executor(workers)
+    max_pending = 2 * (workers or AUDIT_MAX_WORKERS)
+
+    def submit(start):
+        return pool.submit(_audit_chunk, _chunk(snapshot, names[start:start + chunk_size]))
+
+    try:
+        pending = set()
+        starts = iter(starts)
+        while True:
+            for start in starts:
+                pending.add(asyncio.wrap_future(await loop.run_in_executor(None, submit, start)))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                for violation in future.result()[1]:
+                    yield violation
+    finally:
+        # Also reached when the client goes away mid-stream; don't wait for
+        # the workers, and drop the chunks they have not started
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def audit_summary(snapshot, names: List[str], severities: Counter, since: Optional[int]) -> Dict:
+    return {'summary': {
+        'revision': snapshot.revision,
+        'since': since,
+        'vessels_checked': len(names),
+        'violations': severities['violation'],
+        'warnings': severities['warning'],
+        'audited_at': date.today().isoformat(),
+    }}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit stored noon reports and print violations as NDJSON.")
+    parser.add_argument('--vessel', action='append', help="Only audit this vessel (repeatable)")
+    parser.add_argument('--since', type=int, help="Only audit vessels changed after this storage revision")
+    parser.add_argument('--incremental', action='store_true', help="Resume from the revision saved in --state-file")
+    parser.add_argument('--state-file', default='.audit_revision', help="Where the last audited revision is kept")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    from WebApp.storage import storage
+
+    since = args.since
+    if args.incremental and since is None:
+        try:
+            with open(args.state_file, encoding='utf-8') as f:
+                since = int(f.read().strip())
+        except (OSError, ValueError):
+            since = None
+    snapshot = storage.snapshot()
+    names = changed_vessels(snapshot, since, args.vessel)
+    severities = Counter()
+    for violation in run_audit(snapshot, names, args.workers):
+        sys.stdout.write(json.dumps(violation) + "\n")
+        severities[violation['severity']] += 1
+    sys.stdout.write(json.dumps(audit_summary(snapshot, names, severities, since)) + "\n")
+    if args.vessel is None:
+        with open(args.state_file, 'w', encoding='utf-8') as f:
+            f.write(str(snapshot.revision))
+
+if __name__ == '__main__':
+    main()
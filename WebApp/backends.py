@@ -0,0 +1,192 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Persistence backends for DataStorage. The in-memory per-vessel index stays the
+# source of truth for reads; a backend only has to replay its rows (with their
+# revision numbers) at startup and durably record every upserted row afterwards.
+#
+# A shared backend is written by several processes (uvicorn --workers N). Each
+# write then runs inside transaction() after catching up on the rows other
+# processes committed (load_since), and changed() tells a process cheaply
+# whether anyone else has committed since it last looked.
+
+class MemoryBackend:
+    shared = False
+
+    def load(self) -> Iterable[Tuple[Dict, int]]:
+        return []
+
+    def load_since(self, revision: int) -> List[Tuple[Dict, int]]:
+        return []
+
+    def changed(self) -> bool:
+        return False
+
+    def write(self, row: Dict, revision: int):
+        pass
+
+    def write_many(self, rows: List[Tuple[Dict, int]]):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS noon_reports (
+    vessel_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    laden_ballast TEXT,
+    report_type TEXT,
+    revision INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (vessel_name, date)
+) WITHOUT ROWID
+"""
+
+# SQLite in WAL mode. The table is clustered on (vessel_name, date), so loading
+# it in that order is a sequential read of the primary key and rows arrive
+# already grouped and sorted the way DataStorage keeps them.
+#
+# With shared=True every write commits immediately (batching would hide rows
+# from the other processes), and busy_timeout makes a process wait for another
+# one's write transaction instead of failing.
+class SQLiteBackend:
+    def __init__(self, path: str, batch_size: int = 1, flush_interval: float = 1.0, mmap_size: int = 256 * 1024 * 1024,
+                 shared: bool = False, busy_timeout: float = 5.0):
+        self.path = path
+        self.shared = shared
+        self.batch_size = 1 if shared else max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._pending: List[tuple] = []
+        self._timer: Optional[threading.Timer] = None
+        self._data_version: Optional[int] = None
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=busy_timeout)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self._conn.execute(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(noon_reports)")}
+        if 'revision' not in columns:
+            # Databases created before rows carried revision numbers
+            self._conn.execute("ALTER TABLE noon_reports ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS noon_reports_revision ON noon_reports (revision)")
+
+    def load(self) -> Iterable[Tuple[Dict, int]]:
+        cursor = self._conn.execute(
+            "SELECT vessel_name, date, laden_ballast, report_type, revision FROM noon_reports ORDER BY vessel_name, date"
+        )
+        for row in cursor:
+            yield self._row(row)
+
+    def load_since(self, revision: int) -> List[Tuple[Dict, int]]:
+        # Rows committed (by any process) after `revision`, oldest first
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT vessel_name, date, laden_ballast, report_type, revision FROM noon_reports WHERE revision > ? ORDER BY revision",
+                (revision,),
+            )
+            return [self._row(row) for row in cursor]
+
+    @staticmethod
+    def _row(row) -> Tuple[Dict, int]:
+        vessel_name, date_str, laden_ballast, report_type, revision = row
+        return {
+            'Vessel_name': vessel_name,
+            'Date': date.fromisoformat(date_str),
+            'Laden_Ballst': laden_ballast,
+            'Report_Type': report_type,
+        }, revision
+
+    def changed(self) -> bool:
+        # PRAGMA data_version moves only when another connection commits
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            changed, self._data_version = version != self._data_version, version
+            return changed
+
+    def invalidate(self):
+        # Make the next changed() report True, e.g. after a failed catch-up
+        with self._lock:
+            self._data_version = None
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes SQLite's write lock up front, so catching up and
+        # writing happen with no other process committing in between
+        with self._lock:
+            self._commit()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _params(row: Dict, revision: int) -> tuple:
+        return (
+            row['Vessel_name'],
+            row['Date'].isoformat(),
+            row.get('Laden_Ballst'),
+            row.get('Report_Type'),
+            revision,
+        )
+
+    def write(self, row: Dict, revision: int):
+        with self._lock:
+            self._pending.append(self._params(row, revision))
+            if len(self._pending) >= self.batch_size:
+                self._commit()
+            elif self._timer is None:
+                # Bound how long a partial batch can sit in memory.
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def write_many(self, rows: List[Tuple[Dict, int]]):
+        # Commit the rows (and anything already pending) in one transaction
+        with self._lock:
+            self._pending.extend(self._params(row, revision) for row, revision in rows)
+            self._commit()
+
+    def _commit(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        if self._conn.in_transaction:
+            # Part of an enclosing transaction(); it commits or rolls back
+            self._insert(rows)
+            return
+        self._conn.execute("BEGIN")
+        try:
+            self._insert(rows)
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _insert(self, rows: List[tuple]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO noon_reports (vessel_name, date, laden_ballast, report_type, revision) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
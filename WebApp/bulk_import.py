@@ -0,0 +1,157 @@
+import io
+from bisect import bisect_left
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from WebApp.logic import LADEN_BALLAST_VALUES, REPORT_SEQUENCE, VoyageState
+
+REQUIRED_COLUMNS = ['Vessel_name', 'Date', 'Laden_Ballst', 'Report_Type']
+
+CONTENT_TYPE_FORMATS = {
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/json-lines': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+    'application/vnd.apache.parquet': 'parquet',
+    'application/x-parquet': 'parquet',
+    'application/octet-stream': 'parquet',
+}
+
+def detect_format(fmt: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    if fmt:
+        fmt = fmt.lower()
+        return 'jsonl' if fmt in ('ndjson', 'json') else fmt
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    return CONTENT_TYPE_FORMATS.get(media_type)
+
+def read_frame(body: bytes, fmt: str) -> pd.DataFrame:
+    buffer = io.BytesIO(body)
+    if fmt == 'csv':
+        return pd.read_csv(buffer, dtype=str, keep_default_na=False, na_values=[''])
+    if fmt == 'jsonl':
+        return pd.read_json(buffer, lines=True, dtype=False, convert_dates=False)
+    if fmt == 'parquet':
+        return pd.read_parquet(buffer, engine='pyarrow')
+    raise ValueError(f"Unsupported import format: {fmt}")
+
+def _parse_date(value) -> Optional[date]:
+    # The report date as written: an offset does not move it to another day
+    if isinstance(value, str):
+        value = value.strip()
+        if value.endswith(('Z', 'z')):
+            value = value[:-1] + '+00:00'
+        try:
+            return datetime.fromisoformat(value).date()
+        except ValueError:
+            return None
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    return value if isinstance(value, date) else None
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    try:
+        parsed = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    except (TypeError, ValueError):
+        # e.g. naive dates mixed with offsets, or different offsets
+        parsed = None
+    if parsed is not None and pd.api.types.is_datetime64_any_dtype(parsed):
+        return parsed.dt.date
+    return values.map(_parse_date)
+
+def _row_checks(df: pd.DataFrame) -> pd.DataFrame:
+    # Column-wise checks for every row at once; the result has one list of
+    # violations per row, empty when the row is well formed.
+    for col in ('Vessel_name', 'Laden_Ballst', 'Report_Type'):
+        df[col] = df[col].astype('string').str.strip()
+    df['Date'] = _parse_dates(df['Date'])
+    checks = [
+        (df['Vessel_name'].isna() | (df['Vessel_name'] == ''), "Missing vessel name."),
+        (df['Date'].isna(), "Missing or unrecognised date."),
+        (~df['Laden_Ballst'].isin(LADEN_BALLAST_VALUES).fillna(False), "Laden/Ballast must be 'Laden' or 'Ballast'."),
+        (~df['Report_Type'].isin(REPORT_SEQUENCE).fillna(False), "Unknown report type."),
+        (df.duplicated(['Vessel_name', 'Date'], keep='last') & df['Date'].notna(),
+         "Superseded by a later row for the same vessel and date."),
+    ]
+    violations = pd.Series([[] for _ in range(len(df))], index=df.index, dtype=object)
+    for mask, message in checks:
+        mask = mask.fillna(False).astype(bool)
+        for i in mask[mask].index:
+            violations[i].append(message)
+    df['violations'] = violations
+    return df
+
+def _validate_vessel(rows: pd.DataFrame, history: List[Dict], reports: Dict[int, Dict], accepted: List[Dict]):
+    # Replay the vessel in date order: stored rows before the first imported
+    # date seed the voyage state, then stored and imported rows are merged so
+    # each imported row is checked against exactly the history it would follow.
+    dates = [row['Date'] for row in history]
+    start = bisect_left(dates, rows['Date'].iloc[0])
+    state = VoyageState.from_history(history[:start])
+    stored = iter(history[start:])
+    pending = next(stored, None)
+    for row in rows.itertuples():
+        while pending is not None and pending['Date'] < row.Date:
+            state = state.advance(pending)
+            pending = next(stored, None)
+        replaced = pending if pending is not None and pending['Date'] == row.Date else None
+        if replaced is not None:
+            pending = next(stored, None)
+        report = reports[row.Index]
+        is_seq_valid, seq_reason = state.check_report_sequence(row.Report_Type)
+        is_laden_valid, laden_reason = state.check_laden_ballast_change(row.Laden_Ballst, row.Report_Type)
+        is_contradiction, _, reason = state.check_for_contradiction(row.Laden_Ballst, row.Report_Type)
+        if not is_seq_valid:
+            report['violations'].append(seq_reason)
+        if not is_laden_valid:
+            report['violations'].append(laden_reason)
+        if is_contradiction:
+            report['warnings'].append(reason)
+        if report['violations']:
+            # Rejected rows leave the stored row for that date in place
+            if replaced is not None:
+                state = state.advance(replaced)
+            continue
+        entry = {
+            'Vessel_name': row.Vessel_name,
+            'Date': row.Date,
+            'Laden_Ballst': row.Laden_Ballst,
+            'Report_Type': row.Report_Type,
+        }
+        report['valid'] = True
+        accepted.append(entry)
+        state = state.advance(entry)
+
+def validate_frame(df: pd.DataFrame, storage) -> Tuple[List[Dict], List[Dict], Dict[str, int]]:
+    # Returns (row reports, accepted entries, {vessel: revision} of the stored
+    # histories they were validated against)
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    df = _row_checks(df[REQUIRED_COLUMNS].reset_index(drop=True).copy())
+    reports = {
+        i: {
+            'row': i,
+            'Vessel_name': None if pd.isna(df.at[i, 'Vessel_name']) else str(df.at[i, 'Vessel_name']),
+            'Date': None if pd.isna(df.at[i, 'Date']) else df.at[i, 'Date'],
+            'valid': False,
+            'violations': list(df.at[i, 'violations']),
+            'warnings': [],
+        }
+        for i in df.index
+    }
+    accepted: List[Dict] = []
+    revisions: Dict[str, int] = {}
+    snapshot = storage.snapshot()
+    well_formed = df[df['violations'].map(len) == 0].sort_values(['Vessel_name', 'Date'], kind='stable')
+    for vessel_name, rows in well_formed.groupby('Vessel_name', sort=False):
+        rows = rows.astype({'Vessel_name': object, 'Laden_Ballst': object, 'Report_Type': object})
+        history = snapshot.vessels.get(vessel_name)
+        revisions[vessel_name] = history.revision if history else 0
+        _validate_vessel(rows, history.rows if history else (), reports, accepted)
+    return [reports[i] for i in df.index], accepted, revisions
@@ -0,0 +1,97 @@
+import os
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+# Server-side chat sessions, so the client sends only its new message each
+# turn. Older turns are folded into a rolling summary once the history would
+# exceed its token budget, which keeps every prompt bounded regardless of how
+# long the conversation runs.
+
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '1200'))
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv('CHAT_SUMMARY_TOKEN_BUDGET', '300'))
+SUMMARY_LINE_CHARS = 160
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+def _summary_line(msg: Dict) -> str:
+    role = "User" if msg.get('role') == 'user' else "Assistant"
+    content = " ".join(str(msg.get('content', '')).split())
+    if len(content) > SUMMARY_LINE_CHARS:
+        content = content[:SUMMARY_LINE_CHARS - 3] + "..."
+    return f"{role}: {content}"
+
+def compact_turns(turns: List[Dict], summary: str = "", budget: int = CHAT_HISTORY_TOKEN_BUDGET) -> Tuple[str, List[Dict]]:
+    # Keep the newest turns that fit in the budget (always at least the last
+    # one) and move the rest into the summary, trimming its oldest lines.
+    recent_budget = max(budget - CHAT_SUMMARY_TOKEN_BUDGET, 0)
+    used = 0
+    keep_from = len(turns)
+    for i in range(len(turns) - 1, -1, -1):
+        cost = estimate_tokens(str(turns[i].get('content', '')))
+        if used + cost > recent_budget and keep_from < len(turns):
+            break
+        used += cost
+        keep_from = i
+    if keep_from == 0:
+        return summary, list(turns)
+    lines = [line for line in summary.split("\n") if line] + [_summary_line(msg) for msg in turns[:keep_from]]
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > CHAT_SUMMARY_TOKEN_BUDGET:
+        lines.pop(0)
+    return "\n".join(lines), list(turns[keep_from:])
+
+class ChatSession:
+    def __init__(self, session_id: str, vessel_name: str, previous_status: Optional[str], new_status: str,
+                 new_report_type: str, seq_reason: Optional[str] = None, laden_reason: Optional[str] = None):
+        self.session_id = session_id
+        self.vessel_name = vessel_name
+        self.previous_status = previous_status
+        self.new_status = new_status
+        self.new_report_type = new_report_type
+        self.seq_reason = seq_reason
+        self.laden_reason = laden_reason
+        self.summary = ""
+        self.turns: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, role: str, content: str):
+        with self._lock:
+            self.turns.append({'role': role, 'content': content})
+
+    def compact(self, budget: int = CHAT_HISTORY_TOKEN_BUDGET) -> Tuple[str, List[Dict]]:
+        with self._lock:
+            self.summary, self.turns = compact_turns(self.turns, self.summary, budget)
+            return self.summary, list(self.turns)
+
+class ChatSessionStore:
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self._sessions = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def create(self, vessel_name: str, previous_status: Optional[str], new_status: str, new_report_type: str,
+               seq_reason: Optional[str] = None, laden_reason: Optional[str] = None) -> ChatSession:
+        session = ChatSession(uuid.uuid4().hex, vessel_name, previous_status, new_status, new_report_type, seq_reason, laden_reason)
+        with self._lock:
+            self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                # Reinsert to refresh the TTL on activity
+                self._sessions[session_id] = session
+            return session
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+chat_sessions = ChatSessionStore(
+    maxsize=int(os.getenv('CHAT_SESSION_LIMIT', '1024')),
+    ttl=float(os.getenv('CHAT_SESSION_TTL', '3600')),
+)
@@ -1,24 +1,114 @@
+import asyncio
 import os
+import threading
 from dotenv import load_dotenv
-import google.generativeai as genai
 import json
+import re
+import time
+from functools import lru_cache
+from WebApp.chat_sessions import compact_turns
+from WebApp.llm_cache import fingerprint, response_cache
+from WebApp.telemetry import LLM_CALLS, LLM_PROMPT_CHARS, LOCK_WAIT, record_stage
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-if not GOOGLE_API_KEY:
-    raise RuntimeError("GOOGLE_API_KEY not set in .env file.")
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-lite')
+# With LLM_DISABLED set (or no API key) every reply comes from the template fallbacks
+LLM_DISABLED = os.getenv('LLM_DISABLED', '').lower() in ('1', 'true', 'yes')
 
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash-lite')
+class LLMUnavailableError(RuntimeError):
+    pass
 
-def generate_chat_response(conversation_history, vessel_name, previous_status, new_status, new_report_type, seq_reason=None, laden_reason=None):
-    formatted_conversation = []
-    for msg in conversation_history:
-        if msg['role'] == 'user':
-            formatted_conversation.append(f"User: {msg['content']}")
-        else:
-            formatted_conversation.append(f"Assistant: {msg['content']}")
-    conversation_str = "\n".join(formatted_conversation)
+# The client is built on first use (or by the startup warm-up), so importing
+# this module does not pull in google.generativeai.
+model = None
+_model_lock = threading.Lock()
+
+def llm_enabled():
+    return model is not None or (not LLM_DISABLED and bool(GOOGLE_API_KEY))
+
+def llm_status():
+    if model is not None:
+        return "ready"
+    return "lazy" if llm_enabled() else "disabled"
+
+def get_model():
+    global model
+    if model is not None:
+        return model
+    if LLM_DISABLED:
+        raise LLMUnavailableError("the assistant is disabled")
+    if not GOOGLE_API_KEY:
+        raise LLMUnavailableError("GOOGLE_API_KEY not set in .env file.")
+    with _model_lock:
+        if model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=GOOGLE_API_KEY)
+            model = genai.GenerativeModel(GEMINI_MODEL)
+    return model
+
+# Hard deadline for a single model call and the number of calls a process lets
+# run at once; anything slower falls back to the template messages below.
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '10'))
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '8'))
+_model_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+def set_model(client):
+    # Swap the model client, e.g. for the offline stub used by the benchmarks
+    global model
+    model = client
+
+def _record_call(kind, prompt, start, outcome):
+    LLM_CALLS.inc(kind=kind, outcome=outcome)
+    LLM_PROMPT_CHARS.observe(len(prompt), kind=kind)
+    record_stage("gemini.call", time.perf_counter() - start)
+
+def _client(client, kind):
+    if client is not None:
+        return client
+    try:
+        return get_model()
+    except LLMUnavailableError:
+        LLM_CALLS.inc(kind=kind, outcome="unavailable")
+        raise
+
+async def _client_async(client, kind):
+    # Building the client imports google.generativeai; keep that off the event loop
+    if client is not None or model is not None:
+        return _client(client, kind)
+    return await asyncio.get_running_loop().run_in_executor(None, _client, client, kind)
+
+async def _acquire_model_slot(timeout):
+    start = time.perf_counter()
+    await asyncio.wait_for(_model_semaphore.acquire(), timeout=timeout)
+    LOCK_WAIT.observe(time.perf_counter() - start, lock="gemini_semaphore")
+
+async def _generate_content_async(prompt, client=None, kind="chat"):
+    client = await _client_async(client, kind)
+    # The deadline covers waiting for a semaphore slot as well as the call itself
+    async def call():
+        await _acquire_model_slot(None)
+        try:
+            return await client.generate_content_async(
+                prompt, request_options={"timeout": GEMINI_TIMEOUT}
+            )
+        finally:
+            _model_semaphore.release()
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(call(), timeout=GEMINI_TIMEOUT)
+    except asyncio.TimeoutError:
+        _record_call(kind, prompt, start, "timeout")
+        raise
+    except Exception:
+        _record_call(kind, prompt, start, "error")
+        raise
+    _record_call(kind, prompt, start, "ok")
+    return response.text
+
+@lru_cache(maxsize=256)
+def _chat_context_block(vessel_name, previous_status, new_status, new_report_type, seq_reason=None, laden_reason=None):
+    # Everything in the chat prompt except the conversation; constant for a given contradiction
     prompt = f"""
     You are a helpful assistant for a maritime data entry system. The user is currently entering noon data for vessel '{vessel_name}'.
     A potential contradiction or rule violation was flagged: the vessel was consistently '{previous_status}' in its last entries, but the new entry suggests '{new_status}' (Report Type: '{new_report_type}').
@@ -40,21 +130,100 @@ def generate_chat_response(conversation_history, vessel_name, previous_status, n
         prompt += f"\nNote: {seq_reason}"
     if laden_reason:
         prompt += f"\nNote: {laden_reason}"
+    return prompt
+
+def _build_chat_prompt(conversation_history, vessel_name, previous_status, new_status, new_report_type, seq_reason=None, laden_reason=None, summary=""):
+    # Older turns beyond the history token budget are folded into the summary
+    summary, recent = compact_turns(conversation_history, summary or "")
+    formatted_conversation = []
+    for msg in recent:
+        if msg['role'] == 'user':
+            formatted_conversation.append(f"User: {msg['content']}")
+        else:
+            formatted_conversation.append(f"Assistant: {msg['content']}")
+    conversation_str = "\n".join(formatted_conversation)
+    prompt = _chat_context_block(vessel_name, previous_status, new_status, new_report_type, seq_reason, laden_reason)
+    if summary:
+        prompt += f"\nSummary of the earlier conversation:\n{summary}"
     prompt += f"\n{conversation_str}\nAssistant:"
+    return prompt
+
+def _parse_chat_response(response_text):
+    response_text = response_text.strip()
+    if response_text.startswith("```json") and response_text.endswith("```"):
+        response_text = response_text[7:-3].strip()
+    return json.loads(response_text)
+
+def _chat_error_response(e):
+    return {
+        "action": "clarify",
+        "bot_response": f"I'm sorry, I couldn't process that. Please try again or make your decision. (Error: {e})"
+    }
+
+# Decodes one string field of a JSON object as the object streams in, so its
+# text can be forwarded before the closing brace (or even the closing quote)
+# has arrived.
+class StreamingFieldReader:
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field):
+        self._start = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._buffer = ""
+        self._pos = None
+        self.done = False
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._start.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+        buf, i, out = self._buffer, self._pos, []
+        while i < len(buf):
+            c = buf[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c != '\\':
+                out.append(c)
+                i += 1
+                continue
+            if i + 1 >= len(buf):
+                break
+            escape = buf[i + 1]
+            if escape != 'u':
+                out.append(self._ESCAPES.get(escape, escape))
+                i += 2
+                continue
+            if i + 6 > len(buf):
+                break
+            code = int(buf[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                # Surrogate pair: wait for the low half before emitting anything
+                if i + 12 > len(buf):
+                    break
+                low = int(buf[i + 8:i + 12], 16)
+                code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                i += 6
+            out.append(chr(code))
+            i += 6
+        self._pos = i
+        return "".join(out)
+
+async def generate_chat_response_async(conversation_history, vessel_name, previous_status, new_status, new_report_type, seq_reason=None, laden_reason=None, summary=""):
+    prompt = _build_chat_prompt(conversation_history, vessel_name, previous_status, new_status, new_report_type, seq_reason, laden_reason, summary)
     try:
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        if response_text.startswith("```json") and response_text.endswith("```"):
-            response_text = response_text[7:-3].strip()
-        parsed_response = json.loads(response_text)
-        return parsed_response
+        return _parse_chat_response(await _generate_content_async(prompt))
+    except asyncio.TimeoutError:
+        return _chat_error_response("the assistant took too long to respond")
     except Exception as e:
-        return {
-            "action": "clarify",
-            "bot_response": f"I'm sorry, I couldn't process that. Please try again or make your decision. (Error: {e})"
-        }
+        return _chat_error_response(e)
 
-def generate_initial_polite_message(vessel_name, prev_status, new_status, date_str, report_type, model, seq_reason=None, laden_reason=None):
+def _build_initial_message_prompt(vessel_name, prev_status, new_status, date_str, report_type, seq_reason=None, laden_reason=None):
     if seq_reason:
         # Report type issue: Only mention report type, sequence, and allowed types. No status, no correction question.
         initial_message_prompt = f"""
@@ -90,24 +259,85 @@ def generate_initial_polite_message(vessel_name, prev_status, new_status, date_s
         initial_message_prompt += "\nFinally, ask if they would like to review or correct this change status. Just need to raise the flag if the contradiction happens for report type."
         initial_message_prompt += f"\n\nExample desired tone: 'Hey Master, I noticed a change in the 'Laden/Ballast' status for '{vessel_name}' from '{prev_status}' to '{new_status}' on {date_str}. When I analyze report type entries, it is supposed to be '{prev_status}'. Would you like to review this change?'"
     else:
-        # Fallback for generic or unexpected cases
-        return (f"We noticed a potential issue for **{vessel_name}** on {date_str}. "
-                f"The new entry is **{new_status}** with report type **{report_type}**, "
-                f"while previous entries were **{prev_status}**. Please review this entry.")
+        return None
+    return initial_message_prompt
 
+async def stream_chat_response_async(conversation_history, vessel_name, previous_status, new_status, new_report_type, seq_reason=None, laden_reason=None, summary=""):
+    # Yields ("token", text) while the model writes `bot_response`, then one
+    # ("result", dict) with the fully parsed reply (or the usual error reply).
+    prompt = _build_chat_prompt(conversation_history, vessel_name, previous_status, new_status, new_report_type, seq_reason, laden_reason, summary)
+    reader = StreamingFieldReader("bot_response")
+    chunks = []
+    deadline = time.monotonic() + GEMINI_TIMEOUT
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        client = await _client_async(None, "chat_stream")
+    except LLMUnavailableError as e:
+        yield "result", _chat_error_response(e)
+        return
     try:
-        initial_polite_message = model.generate_content(initial_message_prompt).text
+        await _acquire_model_slot(GEMINI_TIMEOUT)
+        try:
+            response = await asyncio.wait_for(
+                client.generate_content_async(prompt, stream=True, request_options={"timeout": GEMINI_TIMEOUT}),
+                timeout=max(deadline - time.monotonic(), 0),
+            )
+            stream = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=max(deadline - time.monotonic(), 0))
+                except StopAsyncIteration:
+                    break
+                chunks.append(chunk.text)
+                token = reader.feed(chunk.text)
+                if token:
+                    yield "token", token
+        finally:
+            _model_semaphore.release()
+        result = _parse_chat_response("".join(chunks))
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        result = _chat_error_response("the assistant took too long to respond")
     except Exception as e:
-        if seq_reason:
-            initial_polite_message = (f"There is a report type issue for **{vessel_name}** on {date_str}.\n"
-                                      f"- You entered: **{report_type}**.\n"
-                                      f"- {seq_reason}\n")
-        elif laden_reason:
-            initial_polite_message = (f"There is a status change for **{vessel_name}** on {date_str}.\n"
-                                      f"- New status: **{new_status}**\n"
-                                      f"- Previous status: **{prev_status}**\n"
-                                      f"Is this change correct?")
-        else:
-            initial_polite_message = f"An issue was detected with the entry for {vessel_name}. Please review."
+        outcome = "error"
+        result = _chat_error_response(e)
+    _record_call("chat_stream", prompt, start, outcome)
+    yield "result", result
+
+def _generic_initial_message(vessel_name, prev_status, new_status, date_str, report_type):
+    # Fallback for generic or unexpected cases
+    return (f"We noticed a potential issue for **{vessel_name}** on {date_str}. "
+            f"The new entry is **{new_status}** with report type **{report_type}**, "
+            f"while previous entries were **{prev_status}**. Please review this entry.")
 
+def _fallback_initial_message(vessel_name, prev_status, new_status, date_str, report_type, seq_reason=None, laden_reason=None):
+    if seq_reason:
+        return (f"There is a report type issue for **{vessel_name}** on {date_str}.\n"
+                f"- You entered: **{report_type}**.\n"
+                f"- {seq_reason}\n")
+    if laden_reason:
+        return (f"There is a status change for **{vessel_name}** on {date_str}.\n"
+                f"- New status: **{new_status}**\n"
+                f"- Previous status: **{prev_status}**\n"
+                f"Is this change correct?")
+    return f"An issue was detected with the entry for {vessel_name}. Please review."
+
+def _initial_message_key(vessel_name, prev_status, new_status, date_str, report_type, seq_reason=None, laden_reason=None):
+    # The prompt is fully determined by these fields, so resubmissions of the
+    # same form reuse the earlier reply instead of calling the model again.
+    return fingerprint('initial_message', vessel_name, prev_status, new_status, report_type, seq_reason, laden_reason, date_str)
+
+async def generate_initial_polite_message_async(vessel_name, prev_status, new_status, date_str, report_type, model=None, seq_reason=None, laden_reason=None):
+    fields = (vessel_name, prev_status, new_status, date_str, report_type, seq_reason, laden_reason)
+    initial_message_prompt = _build_initial_message_prompt(*fields)
+    if initial_message_prompt is None:
+        return _generic_initial_message(*fields[:5])
+    try:
+        initial_polite_message = await response_cache.get_or_create_async(
+            _initial_message_key(*fields),
+            lambda: _generate_content_async(initial_message_prompt, model, kind="initial_message"),
+        )
+    except Exception:
+        initial_polite_message = _fallback_initial_message(*fields)
     return initial_polite_message.strip()
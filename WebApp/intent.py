@@ -0,0 +1,157 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from WebApp.telemetry import registry
+
+# Local intent classifier for chat turns. Replies that map unambiguously onto
+# the chat prompt's actions ("proceed", "correct it to Ballast", ...) are
+# answered here without a model call; anything else is escalated to Gemini.
+
+STATUSES = {'laden': 'Laden', 'ballast': 'Ballast'}
+CONFIDENCE_THRESHOLD = 0.9
+MAX_LOCAL_TOKENS = 8
+
+_STATUS_RE = re.compile(r'\b(laden|ballast)\b')
+_CORRECTION_RE = re.compile(r'\b(correct|change|fix|update|switch|set|make|should be|meant|actually)\b')
+_AFFIRMATIVE_RE = re.compile(
+    r"^(yes|yeah|yep|y|ok|okay|sure|confirm|confirmed|proceed|go ahead|continue|save|save it|submit|"
+    r"it is correct|its correct|it's correct|that is correct|thats correct|that's correct|correct as is|"
+    r"keep it|keep it as is|leave it|leave it as is|all good|fine)( please| thanks| thank you)?$"
+)
+_ESCALATE_RE = re.compile(r"\?|\b(why|what|how|when|which|explain|not|no|don't|dont|didn't|wrong|but)\b")
+
+# Tiny multinomial naive Bayes over a handful of phrasings, used when no rule
+# matched outright. Turns with words outside its vocabulary, and everything it
+# is unsure about, go to the model.
+_TRAINING = {
+    'proceed': [
+        "yes proceed", "go ahead and save", "it is right", "the entry is right", "keep the new status",
+        "please save the entry", "confirm the change", "yes that is right", "proceed with it",
+        "the new status is right", "save as entered", "yes go ahead",
+    ],
+    'correct_status': [
+        "change it", "correct it", "please correct the status", "fix the status", "update the status",
+        "the status should change", "switch the status", "change the status please", "correct the entry",
+    ],
+}
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z']+", text.lower())
+
+class _NaiveBayes:
+    def __init__(self, training: Dict[str, List[str]]):
+        self.vocab = {tok for phrases in training.values() for p in phrases for tok in _tokens(p)}
+        self.log_priors = {}
+        self.log_likelihoods = {}
+        total = sum(len(p) for p in training.values())
+        for label, phrases in training.items():
+            counts = Counter(tok for p in phrases for tok in _tokens(p))
+            denom = sum(counts.values()) + len(self.vocab)
+            self.log_priors[label] = math.log(len(phrases) / total)
+            self.log_likelihoods[label] = {tok: math.log((counts[tok] + 1) / denom) for tok in self.vocab}
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        tokens = [tok for tok in _tokens(text) if tok in self.vocab]
+        if not tokens:
+            return None, 0.0
+        scores = {
+            label: prior + sum(self.log_likelihoods[label][tok] for tok in tokens)
+            for label, prior in self.log_priors.items()
+        }
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / norm
+
+_model = _NaiveBayes(_TRAINING)
+
+_stats_lock = threading.Lock()
+_stats = Counter()
+
+def intent_stats() -> Dict[str, float]:
+    with _stats_lock:
+        local = _stats['local']
+        total = local + _stats['escalated']
+        stats = dict(_stats)
+    stats['local_fraction'] = local / total if total else 0.0
+    return stats
+
+registry.callback(
+    "noon_chat_turns_total", "Chat turns answered locally or escalated to the model.", ("outcome",),
+    lambda: {(outcome,): intent_stats().get(outcome, 0) for outcome in ('local', 'escalated')},
+    kind="counter",
+)
+
+def _record(outcome: str, action: Optional[str] = None):
+    with _stats_lock:
+        _stats[outcome] += 1
+        if action:
+            _stats[f'local_{action}'] += 1
+
+def _last_message(conversation_history, role: str) -> Optional[str]:
+    for msg in reversed(conversation_history):
+        if (msg.get('role') == 'user') == (role == 'user'):
+            return msg.get('content') or ''
+    return None
+
+def classify_intent(text: str, last_bot_message: Optional[str] = None,
+                    new_status: Optional[str] = None) -> Tuple[Optional[str], Optional[str], float]:
+    # Returns (action, corrected_status, confidence); action is None when unsure
+    normalized = " ".join(_tokens(text))
+    if not normalized or len(normalized.split()) > MAX_LOCAL_TOKENS:
+        return None, None, 0.0
+    statuses = {STATUSES[m] for m in _STATUS_RE.findall(normalized)}
+    asks_review = bool(last_bot_message) and last_bot_message.rstrip().endswith('?')
+    if _ESCALATE_RE.search(text.lower()):
+        return None, None, 0.0
+    if len(statuses) > 1:
+        return None, None, 0.0
+    if not statuses and 'correct' in normalized.split() and asks_review and last_bot_message.rstrip().endswith('correct?'):
+        # "correct" answering "Is this change correct?" is an answer, not a request to correct
+        return None, None, 0.0
+    if statuses and _CORRECTION_RE.search(normalized):
+        return 'correct_status', statuses.pop(), 1.0
+    if _AFFIRMATIVE_RE.match(normalized):
+        # A bare "yes" to "Would you like to review this change?" means review, not proceed
+        if asks_review and normalized.split()[0] in ('yes', 'yeah', 'yep', 'y', 'ok', 'okay', 'sure'):
+            return None, None, 0.0
+        return 'proceed', None, 1.0
+    if not statuses and _CORRECTION_RE.search(normalized) and len(normalized.split()) <= 4:
+        # "correct it" without a target status: ask which one, as the prompt requires
+        return 'clarify', None, 1.0
+    if any(tok not in _model.vocab and tok not in STATUSES for tok in normalized.split()):
+        # Words the model never saw ("revert", "old", "back") can reverse what the rest says
+        return None, None, 0.0
+    label, confidence = _model.predict(normalized)
+    if label == 'correct_status' and not statuses:
+        return 'clarify', None, confidence
+    if label == 'correct_status':
+        return 'correct_status', statuses.pop(), confidence
+    if statuses and statuses != {new_status}:
+        # "Laden is right" while the entry says Ballast does not mean proceed
+        return None, None, 0.0
+    return label, None, confidence
+
+def resolve_locally(conversation_history, vessel_name, new_status, new_report_type) -> Optional[Dict]:
+    # Returns a ChatResponse-shaped dict, or None when the turn needs the model
+    text = _last_message(conversation_history, 'user')
+    if text is None:
+        _record('escalated')
+        return None
+    action, corrected_status, confidence = classify_intent(text, _last_message(conversation_history, 'bot'), new_status)
+    if action is None or confidence < CONFIDENCE_THRESHOLD:
+        _record('escalated')
+        return None
+    _record('local', action)
+    if action == 'proceed':
+        bot_response = f"Understood. I'll save the {new_report_type} entry for {vessel_name} as {new_status}."
+    elif action == 'correct_status':
+        bot_response = f"Got it. I'll correct the status for {vessel_name} to {corrected_status}."
+    else:
+        bot_response = "Would you like to correct the status to Laden or Ballast?"
+    result = {"action": action, "bot_response": bot_response}
+    if corrected_status:
+        result["corrected_status"] = corrected_status
+    return result
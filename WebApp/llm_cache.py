@@ -0,0 +1,172 @@
+import asyncio
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional
+
+from cachetools import TTLCache
+
+from WebApp.telemetry import registry
+
+# Bounded LRU + TTL cache for model responses whose prompt is fully determined
+# by a handful of fields. Concurrent callers asking for the same key share a
+# single model call instead of each issuing their own.
+#
+# With a path set, the cache is also written to disk a few seconds after it
+# changes, by a timer thread, so no request waits for the file. Entries keep
+# their original expiry across restarts.
+
+def fingerprint(*parts) -> str:
+    normalized = [" ".join(str(p).split()).casefold() if p is not None else None for p in parts]
+    return hashlib.sha256(json.dumps(normalized).encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, path: Optional[str] = None, save_interval: float = 5.0):
+        self.ttl = ttl
+        self.path = path
+        self.save_interval = save_interval
+        # Wall-clock timer, so expiry times still mean something after a restart
+        self._restoring_at: Optional[float] = None
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, timer=self._clock)
+        self._saved_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._inflight: Dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        if path:
+            self._load()
+            atexit.register(self.flush)
+
+    def _clock(self) -> float:
+        # While restoring, entries are inserted as of when they were first cached
+        return self._restoring_at if self._restoring_at is not None else time.time()
+
+    def _lookup(self, key: str):
+        # Returns (cached value, in-flight future, whether the caller leads the call)
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self.hits += 1
+                return value, None, False
+            future = self._inflight.get(key)
+            if future is None:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                return None, future, True
+            self.shared += 1
+            return None, future, False
+
+    def _finish(self, key: str, future: Future, value=None, error: Optional[BaseException] = None):
+        with self._lock:
+            del self._inflight[key]
+            if error is None:
+                self._cache[key] = value
+                if self.path:
+                    self._saved_at[key] = time.time()
+                    self._schedule_save()
+        if error is None:
+            future.set_result(value)
+        else:
+            # Failures are not cached; waiting callers see the same error
+            future.set_exception(error if isinstance(error, Exception) else RuntimeError("model call was cancelled"))
+
+    async def get_or_create_async(self, key: str, factory: Callable[[], Awaitable[str]]) -> str:
+        value, future, leader = self._lookup(key)
+        if future is None:
+            return value
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            value = await factory()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared': self.shared,
+                'size': len(self._cache),
+                'inflight': len(self._inflight),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._saved_at.clear()
+            if self.path:
+                self._schedule_save()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        # Oldest first, as TTLCache expects insertion times to only move forward
+        for key, (value, saved_at) in sorted(saved.items(), key=lambda item: item[1][1]):
+            # Anything already expired is dropped; the rest expires when it would have
+            if now - saved_at < self.ttl:
+                self._restoring_at = min(saved_at, now)
+                try:
+                    self._cache[key] = value
+                finally:
+                    self._restoring_at = None
+                self._saved_at[key] = saved_at
+
+    def _schedule_save(self):
+        # Caller holds self._lock. Changes within save_interval share one write.
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_interval, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        # Writes the cache to disk; the file write happens outside self._lock
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                now = time.time()
+                saved = {key: [value, self._saved_at.get(key, now)] for key, value in self._cache.items()}
+                # Keep the timestamps bounded to what the cache still holds
+                self._saved_at = {key: saved_at for key, (_, saved_at) in saved.items()}
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(saved, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+
+response_cache = ResponseCache(
+    maxsize=int(os.getenv('GEMINI_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('GEMINI_CACHE_TTL', '3600')),
+    path=os.getenv('GEMINI_CACHE_PATH') or None,
+    save_interval=float(os.getenv('GEMINI_CACHE_SAVE_INTERVAL', '5')),
+)
+
+registry.callback(
+    "noon_llm_cache_requests_total", "Response cache lookups: hit, miss, or shared with an in-flight call.", ("result",),
+    lambda: {(result,): response_cache.stats()[stat] for result, stat in (('hit', 'hits'), ('miss', 'misses'), ('shared', 'shared'))},
+    kind="counter",
+)
+registry.callback(
+    "noon_llm_cache_entries", "Cached responses and in-flight model calls.", ("state",),
+    lambda: {(state,): response_cache.stats()[state] for state in ('size', 'inflight')},
+)
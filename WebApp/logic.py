@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import List, Dict, Tuple, Optional
+from WebApp.telemetry import span
 
 REPORT_SEQUENCE = [
     "At Sea",
@@ -9,6 +10,13 @@ REPORT_SEQUENCE = [
     "Departure From Berth",
     "Departure"
 ]
+LADEN_BALLAST_VALUES = ["Laden", "Ballast"]
+
+IN_PORT_PREV_REPORTS = ("Arrival", "Arrival At Berth", "Departure From Berth", "In Port")
+IN_PORT_SEQUENCE_REASON = ("'In Port' is only allowed after 'Arrival', 'Arrival At Berth', or 'Departure From Berth', and before 'Departure'. "
+                           "Please enter 'In Port' only between these events.")
+LADEN_BALLAST_REASON = "Laden/Ballast status can only change after 'Arrival At Berth'."
+LOOKBACK_ROWS = 5
 
 # Helper to get the next valid report types
 def get_next_valid_report_types(history):
@@ -23,6 +31,10 @@ def get_next_valid_report_types(history):
         if r != "In Port":
             last = r
             break
+    return next_valid_after(last)
+
+def next_valid_after(last):
+    # Valid next report types given the last report that was not 'In Port'
     if last is None:
         return [REPORT_SEQUENCE[0]]
     idx = REPORT_SEQUENCE.index(last)
@@ -46,7 +58,7 @@ def check_report_sequence(vessel_history, new_report_type):
     # 'In Port' is valid if the previous report is after 'Arrival', 'Arrival At Berth', or 'Departure From Berth', and before 'Departure'
     if new_report_type == "In Port":
         last_report = history_types[-1] if history_types else None
-        allowed_prev = ["Arrival", "Arrival At Berth", "Departure From Berth", "In Port"]
+        allowed_prev = IN_PORT_PREV_REPORTS
         # Find if 'Departure' exists after last 'Arrival'
         try:
             arrival_idx = max(i for i, t in enumerate(history_types) if t == "Arrival")
@@ -63,10 +75,12 @@ def check_report_sequence(vessel_history, new_report_type):
         if last_report in allowed_prev and ("Departure" not in history_types[arrival_idx+1:]):
             return True, None
         else:
-            return False, ("'In Port' is only allowed after 'Arrival', 'Arrival At Berth', or 'Departure From Berth', and before 'Departure'. "
-                           "Please enter 'In Port' only between these events.")
+            return False, IN_PORT_SEQUENCE_REASON
     if new_report_type in valid_next:
         return True, None
+    return False, sequence_reason(valid_next, new_report_type)
+
+def sequence_reason(valid_next, new_report_type):
     # Format valid_next as a natural language list
     if len(valid_next) == 1:
         valid_str = valid_next[0]
@@ -74,8 +88,8 @@ def check_report_sequence(vessel_history, new_report_type):
         valid_str = f"{valid_next[0]} or {valid_next[1]}"
     else:
         valid_str = ", ".join(valid_next[:-1]) + f", or {valid_next[-1]}"
-    return False, (f"The next valid report type should be {valid_str}, but you entered '{new_report_type}'. "
-                   f"Please check the sequence and try again.")
+    return (f"The next valid report type should be {valid_str}, but you entered '{new_report_type}'. "
+            f"Please check the sequence and try again.")
 
 def check_laden_ballast_change(vessel_history, new_laden_ballast, new_report_type):
     # Only allow Laden/Ballast change after 'Arrival At Berth'
@@ -93,22 +107,25 @@ def check_laden_ballast_change(vessel_history, new_laden_ballast, new_report_typ
             if row['Report_Type'] in ['Departure From Berth', 'Departure']:
                 break
         if not allowed:
-            return False, "Laden/Ballast status can only change after 'Arrival At Berth'."
+            return False, LADEN_BALLAST_REASON
     return True, None
 
-def check_for_contradiction(vessel_name: str, new_laden_ballast: str, new_report_type: str, data: List[Dict], lookback_rows: int = 5) -> Tuple[bool, Optional[str], Optional[str]]:
-    vessel_df = [row for row in data if row['Vessel_name'] == vessel_name]
-    # Normalize all 'Date' fields to datetime.date for consistent sorting
-    for row in vessel_df:
-        if isinstance(row['Date'], str):
+def _row_date(row):
+    value = row['Date']
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
             try:
-                row['Date'] = datetime.strptime(row['Date'], '%Y-%m-%d').date()
-            except ValueError:
-                try:
-                    row['Date'] = datetime.strptime(row['Date'], '%Y-%m-%dT%H:%M:%S').date()
-                except Exception:
-                    pass  # If parsing fails, leave as is
-    vessel_df = sorted(vessel_df, key=lambda x: x['Date'], reverse=False)
+                return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S').date()
+            except Exception:
+                pass  # If parsing fails, leave as is
+    return value
+
+def check_for_contradiction(vessel_name: str, new_laden_ballast: str, new_report_type: str, data: List[Dict], lookback_rows: int = LOOKBACK_ROWS) -> Tuple[bool, Optional[str], Optional[str]]:
+    vessel_df = [row for row in data if row['Vessel_name'] == vessel_name]
+    # Sort on the 'Date' normalized to datetime.date; rows may be shared, so leave them untouched
+    vessel_df = sorted(vessel_df, key=_row_date, reverse=False)
     if len(vessel_df) < lookback_rows:
         return False, None, None
     recent_statuses = list({row['Laden_Ballst'] for row in vessel_df[:lookback_rows]})
@@ -119,3 +136,87 @@ def check_for_contradiction(vessel_name: str, new_laden_ballast: str, new_report
     if previous_status and previous_status != new_laden_ballast:
         return True, previous_status, f"Status changed from {previous_status} to {new_laden_ballast} without a typical event (Report Type: {new_report_type})"
     return False, None, None
+
+
+# Compact per-vessel voyage state, folded forward one report at a time so a
+# proposed entry can be validated without re-scanning the vessel's history.
+# Every check returns exactly what the history-based function above would.
+class VoyageState:
+    __slots__ = ("count", "last_report", "last_status", "last_non_in_port",
+                 "departure_since_arrival", "berth_open", "head_statuses")
+
+    def __init__(self, count=0, last_report=None, last_status=None, last_non_in_port=None,
+                 departure_since_arrival=False, berth_open=False, head_statuses=()):
+        self.count = count
+        self.last_report = last_report
+        self.last_status = last_status
+        # Last report that was not 'In Port' (drives the next valid report types)
+        self.last_non_in_port = last_non_in_port
+        # Whether a 'Departure' was reported after the latest 'Arrival'
+        self.departure_since_arrival = departure_since_arrival
+        # Whether the latest berth event was 'Arrival At Berth', i.e. cargo may change
+        self.berth_open = berth_open
+        # Laden/Ballast of the oldest LOOKBACK_ROWS reports
+        self.head_statuses = head_statuses
+
+    @classmethod
+    def from_history(cls, vessel_history):
+        state = cls()
+        with span("logic.replay"):
+            for row in vessel_history:
+                state = state.advance(row)
+        return state
+
+    def advance(self, row) -> "VoyageState":
+        report_type = row['Report_Type']
+        status = row['Laden_Ballst']
+        departure_since_arrival = self.departure_since_arrival
+        berth_open = self.berth_open
+        if report_type == "Arrival":
+            departure_since_arrival = False
+        elif report_type == "Departure":
+            departure_since_arrival = True
+        if report_type == "Arrival At Berth":
+            berth_open = True
+        elif report_type in ("Departure From Berth", "Departure"):
+            berth_open = False
+        head_statuses = self.head_statuses
+        if len(head_statuses) < LOOKBACK_ROWS:
+            head_statuses = head_statuses + (status,)
+        return VoyageState(
+            count=self.count + 1,
+            last_report=report_type,
+            last_status=status,
+            last_non_in_port=report_type if report_type != "In Port" else self.last_non_in_port,
+            departure_since_arrival=departure_since_arrival,
+            berth_open=berth_open,
+            head_statuses=head_statuses,
+        )
+
+    def check_report_sequence(self, new_report_type):
+        valid_next = next_valid_after(self.last_non_in_port)
+        if new_report_type == "In Port":
+            if self.last_report in IN_PORT_PREV_REPORTS and not self.departure_since_arrival:
+                return True, None
+            return False, IN_PORT_SEQUENCE_REASON
+        if new_report_type in valid_next:
+            return True, None
+        return False, sequence_reason(valid_next, new_report_type)
+
+    def check_laden_ballast_change(self, new_laden_ballast, new_report_type):
+        if self.count < 1:
+            return True, None
+        if self.last_status != new_laden_ballast and not self.berth_open:
+            return False, LADEN_BALLAST_REASON
+        return True, None
+
+    def check_for_contradiction(self, new_laden_ballast, new_report_type) -> Tuple[bool, Optional[str], Optional[str]]:
+        if self.count < LOOKBACK_ROWS:
+            return False, None, None
+        recent_statuses = set(self.head_statuses)
+        previous_status = next(iter(recent_statuses)) if len(recent_statuses) == 1 else None
+        if new_report_type in ['Departure', 'Departure From Berth']:
+            return False, None, None
+        if previous_status and previous_status != new_laden_ballast:
+            return True, previous_status, f"Status changed from {previous_status} to {new_laden_ballast} without a typical event (Report Type: {new_report_type})"
+        return False, None, None
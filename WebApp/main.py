@@ -1,16 +1,48 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from WebApp.models import NoonEntry, ContradictionCheckRequest, ContradictionCheckResponse, ChatRequest, ChatResponse, AddEntryRequest, NoonDataResponse
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from collections import Counter
+from importlib import import_module
+from WebApp.models import NoonEntry, ContradictionCheckRequest, ContradictionCheckResponse, ChatRequest, ChatResponse, AddEntryRequest, NoonDataResponse, BulkImportResponse
 from WebApp.storage import storage
-from WebApp.logic import check_for_contradiction, check_report_sequence, check_laden_ballast_change
-from WebApp.gemini_api import generate_chat_response, generate_initial_polite_message, model
-from typing import List
-from datetime import datetime
+from WebApp.chat_sessions import chat_sessions
+from WebApp.noon_feed import RESYNC, noon_feed
+from WebApp.intent import intent_stats, resolve_locally
+from WebApp.audit import AUDIT_MAX_WORKERS, audit_summary, changed_vessels, run_audit_async
+from WebApp.gemini_api import generate_chat_response_async, generate_initial_polite_message_async, get_model, llm_enabled, llm_status, stream_chat_response_async
+from WebApp.telemetry import REQUESTS, REQUEST_DURATION, profiler, registry, server_timing, span, start_trace
+from typing import List, Optional
+from datetime import date, datetime
+import hashlib
+import asyncio
+import hmac
+import json
+import os
+import time
 
-app = FastAPI()
+def warm_up():
+    # Loads storage and builds the Gemini client off the request path
+    with span("startup.storage"):
+        storage.initialize()
+    if llm_enabled():
+        try:
+            with span("startup.llm"):
+                get_model()
+        except Exception:
+            pass
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the server accepts connections right away;
+    # requests that arrive first initialize whatever they need themselves.
+    app.state.warm_up = asyncio.get_running_loop().run_in_executor(None, warm_up)
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="WebApp/static"), name="static")
 templates = Jinja2Templates(directory="WebApp/templates")
@@ -24,35 +56,94 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    # Per-request stage timings go back to the caller as a Server-Timing header;
+    # streamed responses are timed until their headers are sent.
+    trace = start_trace()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    REQUESTS.inc(method=request.method, route=path, status=response.status_code)
+    REQUEST_DURATION.observe(elapsed, method=request.method, route=path)
+    trace.append(("total", elapsed))
+    response.headers["Server-Timing"] = server_timing(trace)
+    return response
+
 @app.get("/", response_class=HTMLResponse)
 def serve_index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+@app.get("/healthz")
+def healthz():
+    return {
+        "storage": "ready" if storage.initialized else "loading",
+        "llm": llm_status(),
+    }
+
 @app.post("/add_entry")
 def add_entry(req: AddEntryRequest):
     entry = req.entry.model_dump()
     storage.add_entry(entry)
     return {"success": True}
 
-def get_last_known_status_and_report(vessel_history):
-    if not vessel_history:
-        return None, None
-    last_entry = vessel_history[-1]
-    prev_status = last_entry.get('Laden_Ballst') or last_entry.get('Laden/Ballst')
-    prev_report = last_entry.get('Report_Type')
-    return prev_status, prev_report
+# Validation runs outside the storage lock; an import that raced with other
+# writes to the same vessels is revalidated against the new history.
+BULK_IMPORT_ATTEMPTS = 3
 
-@app.post("/check_contradiction", response_model=ContradictionCheckResponse)
-def check_contradiction(req: ContradictionCheckRequest):
-    data = storage.get_data()
-    vessel_history = [row for row in data if row['Vessel_name'] == req.vessel_name]
-    prev_status, prev_report = get_last_known_status_and_report(vessel_history)
-    is_seq_valid, seq_reason = check_report_sequence(vessel_history, req.new_report_type)
-    is_laden_valid, laden_reason = check_laden_ballast_change(vessel_history, req.new_laden_ballast, req.new_report_type)
-    is_contradiction, _, reason = check_for_contradiction(
-        req.vessel_name, req.new_laden_ballast, req.new_report_type, data
+@app.post("/bulk_import", response_model=BulkImportResponse)
+async def bulk_import(request: Request, format: Optional[str] = None):
+    # Accepts a raw CSV, JSON-lines or Parquet body; the format comes from the
+    # `format` query parameter or the Content-Type header.
+    # pandas is only imported once the first import arrives
+    bulk = await run_in_threadpool(import_module, 'WebApp.bulk_import')
+    fmt = bulk.detect_format(format, request.headers.get('content-type'))
+    if fmt not in ('csv', 'jsonl', 'parquet'):
+        raise HTTPException(status_code=415, detail="Send CSV, JSON-lines or Parquet data, or set ?format=csv|jsonl|parquet.")
+    body = await request.body()
+
+    def run_import():
+        try:
+            df = bulk.read_frame(body, fmt)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        for _ in range(BULK_IMPORT_ATTEMPTS):
+            try:
+                reports, accepted, revisions = bulk.validate_frame(df, storage)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            # Only commit if no entry for these vessels landed since validation
+            if not accepted or storage.add_entries(accepted, expected=revisions):
+                return reports, accepted
+        raise HTTPException(status_code=409, detail="These vessels kept changing during the import; please try again.")
+
+    reports, accepted = await run_in_threadpool(run_import)
+    return BulkImportResponse(
+        imported=len(accepted),
+        rejected=len(reports) - len(accepted),
+        rows=reports,
     )
+
+@app.post("/check_contradiction", response_model=ContradictionCheckResponse)
+async def check_contradiction(req: ContradictionCheckRequest):
+    def voyage_state():
+        # Other workers may have saved entries for this vessel since our last
+        # poll. Catching up (or loading the store on first use) takes the
+        # storage lock and reads SQLite, so it runs off the event loop.
+        storage.refresh()
+        return storage.get_voyage_state(req.vessel_name)
+
+    with span("check_contradiction.state"):
+        state = await run_in_threadpool(voyage_state)
+    prev_status = state.last_status
+    with span("check_contradiction.validate"):
+        is_seq_valid, seq_reason = state.check_report_sequence(req.new_report_type)
+        is_laden_valid, laden_reason = state.check_laden_ballast_change(req.new_laden_ballast, req.new_report_type)
+        is_contradiction, _, reason = state.check_for_contradiction(req.new_laden_ballast, req.new_report_type)
     initial_message = None
+    session_id = None
     if not is_seq_valid:
         reason = seq_reason
         is_contradiction = True
@@ -62,34 +153,284 @@ def check_contradiction(req: ContradictionCheckRequest):
     if is_contradiction:
         # Generate initial polite message for contradiction
         date_str = datetime.now().date()
-        initial_message = generate_initial_polite_message(
-            vessel_name=req.vessel_name,
-            prev_status=prev_status or 'Unknown',
-            new_status=req.new_laden_ballast or 'Unknown',
-            date_str=str(date_str),
-            report_type=req.new_report_type or 'Unknown',
-            model=model,
+        with span("check_contradiction.message"):
+            initial_message = await generate_initial_polite_message_async(
+                vessel_name=req.vessel_name,
+                prev_status=prev_status or 'Unknown',
+                new_status=req.new_laden_ballast or 'Unknown',
+                date_str=str(date_str),
+                report_type=req.new_report_type or 'Unknown',
+                seq_reason=seq_reason if not is_seq_valid else None,
+                laden_reason=laden_reason if not is_laden_valid else None
+            )
+        # Follow-up chat turns only send their new message and this session id
+        session = chat_sessions.create(
+            req.vessel_name, prev_status, req.new_laden_ballast, req.new_report_type,
             seq_reason=seq_reason if not is_seq_valid else None,
-            laden_reason=laden_reason if not is_laden_valid else None
+            laden_reason=laden_reason if not is_laden_valid else None,
         )
+        session.add('bot', initial_message or reason or '')
+        session_id = session.session_id
     return ContradictionCheckResponse(
         is_contradiction=is_contradiction,
         previous_status=prev_status,
-        reason=initial_message if initial_message else reason
+        reason=initial_message if initial_message else reason,
+        session_id=session_id
     )
 
+def open_chat_session(req: ChatRequest):
+    # Returns the server-side session with this turn's message recorded, or
+    # None for clients that still send the whole conversation every turn.
+    if not req.session_id and req.message is None:
+        return None
+    session = chat_sessions.get(req.session_id) if req.session_id else None
+    if session is None:
+        if req.session_id and not req.conversation_history:
+            # Expired, evicted, lost in a restart or held by another worker:
+            # the client answers 410 by resending the conversation it shows
+            raise HTTPException(status_code=410, detail="Chat session not found; resend the conversation history.")
+        # Rebuild the session from the client's copy, with the rule notes the
+        # original check attached to it
+        state = storage.get_voyage_state(req.vessel_name)
+        _, seq_reason = state.check_report_sequence(req.new_report_type)
+        _, laden_reason = state.check_laden_ballast_change(req.new_status, req.new_report_type)
+        session = chat_sessions.create(req.vessel_name, req.previous_status, req.new_status, req.new_report_type,
+                                       seq_reason=seq_reason, laden_reason=laden_reason)
+        for msg in req.conversation_history:
+            session.add(msg.get('role'), msg.get('content'))
+    if req.message:
+        session.add('user', req.message)
+    return session
+
+def chat_turn_args(req: ChatRequest, session) -> dict:
+    if session is None:
+        return dict(
+            conversation_history=req.conversation_history,
+            vessel_name=req.vessel_name,
+            previous_status=req.previous_status,
+            new_status=req.new_status,
+            new_report_type=req.new_report_type,
+        )
+    summary, turns = session.compact()
+    return dict(
+        conversation_history=turns,
+        vessel_name=session.vessel_name,
+        previous_status=session.previous_status,
+        new_status=session.new_status,
+        new_report_type=session.new_report_type,
+        seq_reason=session.seq_reason,
+        laden_reason=session.laden_reason,
+        summary=summary,
+    )
+
+def resolve_turn_locally(args: dict):
+    return resolve_locally(args['conversation_history'], args['vessel_name'], args['new_status'], args['new_report_type'])
+
+def finish_chat_turn(session, result: ChatResponse) -> ChatResponse:
+    if session is not None:
+        session.add('bot', result.bot_response)
+        result.session_id = session.session_id
+    return result
+
 @app.post("/chat_response", response_model=ChatResponse)
-def chat_response(req: ChatRequest):
-    result = generate_chat_response(
-        req.conversation_history,
-        req.vessel_name,
-        req.previous_status,
-        req.new_status,
-        req.new_report_type,
+async def chat_response(req: ChatRequest):
+    session = await run_in_threadpool(open_chat_session, req)
+    args = chat_turn_args(req, session)
+    # Unambiguous replies are answered locally; only the rest reach Gemini
+    result = resolve_turn_locally(args)
+    if result is None:
+        result = await generate_chat_response_async(**args)
+    return finish_chat_turn(session, ChatResponse(**result))
+
+def sse_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat_response/stream")
+async def chat_response_stream(req: ChatRequest):
+    # Server-Sent Events: `token` events carry bot_response text as it is
+    # generated, a final `result` event carries the parsed ChatResponse.
+    session = await run_in_threadpool(open_chat_session, req)
+    args = chat_turn_args(req, session)
+
+    async def events():
+        local = resolve_turn_locally(args)
+        if local is not None:
+            yield sse_event("token", {"text": local["bot_response"]})
+            yield sse_event("result", finish_chat_turn(session, ChatResponse(**local)).model_dump())
+            return
+        async for kind, payload in stream_chat_response_async(**args):
+            if kind == "token":
+                yield sse_event("token", {"text": payload})
+                continue
+            try:
+                result = ChatResponse(**payload)
+            except Exception as e:
+                result = ChatResponse(action="clarify", bot_response=f"I'm sorry, I couldn't process that. Please try again or make your decision. (Error: {e})")
+            yield sse_event("result", finish_chat_turn(session, result).model_dump())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    return ChatResponse(**result)
+
+@app.get("/chat_stats")
+def chat_stats():
+    return intent_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# The sampling profiler is only reachable when PROFILER_TOKEN is set, and each
+# call must send it in the X-Profiler-Token header.
+PROFILER_TOKEN = os.getenv('PROFILER_TOKEN')
+
+def require_profiler_token(request: Request):
+    token = request.headers.get('x-profiler-token') or ''
+    if not PROFILER_TOKEN or not hmac.compare_digest(token, PROFILER_TOKEN):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.post("/debug/profiler/start")
+def profiler_start(request: Request, interval: float = Query(0.01, ge=0.001, le=1.0), reset: bool = True):
+    require_profiler_token(request)
+    profiler.start(interval, reset)
+    return profiler.status()
+
+@app.post("/debug/profiler/stop")
+def profiler_stop(request: Request):
+    require_profiler_token(request)
+    profiler.stop()
+    return profiler.status()
+
+@app.get("/debug/profiler", response_class=PlainTextResponse)
+def profiler_stacks(request: Request, limit: Optional[int] = Query(None, ge=1)):
+    # Collapsed stacks, ready for flamegraph.pl or speedscope
+    require_profiler_token(request)
+    return PlainTextResponse(profiler.collapsed(limit), headers={"X-Profiler-Samples": str(profiler.samples)})
+
+# Storage revision covered by the last complete fleet-wide audit in this process
+last_audit_revision: Optional[int] = None
+
+@app.post("/audit")
+async def audit(
+    incremental: bool = False,
+    since: Optional[int] = None,
+    vessel: Optional[List[str]] = Query(None),
+    workers: Optional[int] = Query(None, ge=1, le=AUDIT_MAX_WORKERS),
+):
+    # Streams one JSON violation or warning per line, then a summary line. Incremental
+    # runs only re-check vessels changed since the last complete audit.
+    if incremental and since is None:
+        since = last_audit_revision
+    def current_snapshot():
+        storage.refresh()
+        return storage.snapshot()
+
+    snapshot = await run_in_threadpool(current_snapshot)
+    names = changed_vessels(snapshot, since, vessel)
+
+    async def lines():
+        global last_audit_revision
+        severities = Counter()
+        async for violation in run_audit_async(snapshot, names, workers):
+            severities[violation['severity']] += 1
+            yield json.dumps(violation) + "\n"
+        yield json.dumps(audit_summary(snapshot, names, severities, since)) + "\n"
+        if vessel is None:
+            last_audit_revision = snapshot.revision
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+NOON_FEED_KEEPALIVE = float(os.getenv('NOON_FEED_KEEPALIVE', '15'))
+
+def feed_rows(records) -> list:
+    return [dict(record.to_dict(), Date=record['Date'].isoformat()) for record in records]
+
+@app.get("/noon_data/stream")
+async def noon_data_stream(request: Request, vessel: Optional[List[str]] = Query(None), since: Optional[int] = None):
+    # Server-Sent Events: a `snapshot` event with the subscribed vessels' rows,
+    # then a `delta` event with the rows of every committed change. Event ids
+    # are storage revisions, so a reconnecting EventSource (Last-Event-ID) gets
+    # a delta of what it missed instead of a new snapshot.
+    last_event_id = request.headers.get('last-event-id', '')
+    if since is None and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    def initial(since):
+        storage.refresh()
+        if since is not None and since < storage.revision_floor:
+            # An id from an earlier run of an in-memory store: start over
+            since = None
+        rows, _, revision = storage.query(vessels=vessel, since=since)
+        if since is None:
+            return revision, sse_event("snapshot", {"revision": revision, "rows": feed_rows(rows)}, revision)
+        return revision, sse_event("delta", {"revision": revision, "rows": feed_rows(rows)}, revision)
+
+    async def events():
+        # Subscribe before reading, so no change falls between the two. This
+        # happens in here so the finally below always undoes it, even when the
+        # response is dropped before its body is iterated.
+        client = noon_feed.connect(vessel)
+        try:
+            revision, event = await run_in_threadpool(initial, since)
+            yield event
+            while True:
+                try:
+                    item = await asyncio.wait_for(client.queue.get(), NOON_FEED_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if item is RESYNC:
+                    # This client fell behind and its backlog was dropped
+                    revision, event = await run_in_threadpool(initial, None)
+                    yield event
+                    continue
+                rows = [record for record, row_revision in item if row_revision > revision]
+                if rows:
+                    revision = item[-1][1]
+                    yield sse_event("delta", {"revision": revision, "rows": feed_rows(rows)}, revision)
+        finally:
+            noon_feed.disconnect(client)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def noon_data_etag(revision: int, request: Request) -> str:
+    # The same query against the same storage revision always yields the same rows
+    params = hashlib.sha1(str(sorted(request.query_params.multi_items())).encode('utf-8')).hexdigest()[:16]
+    return f'W/"{revision}-{params}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    return bool(header) and (header.strip() == '*' or etag in [tag.strip() for tag in header.split(',')])
 
 @app.get("/get_noon_data", response_model=NoonDataResponse)
-def get_noon_data():
-    data = storage.get_data()
-    return NoonDataResponse(data=data)
+def get_noon_data(
+    request: Request,
+    response: Response,
+    vessel: Optional[List[str]] = Query(None),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    since: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+):
+    # Unchanged storage means an unchanged answer; skip the query entirely
+    storage.refresh()
+    etag = noon_data_etag(storage.revision, request)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    try:
+        data, next_cursor, revision = storage.query(
+            vessels=vessel, date_from=date_from, date_to=date_to, since=since, cursor=cursor, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response.headers["ETag"] = noon_data_etag(revision, request)
+    response.headers["Cache-Control"] = "no-cache"
+    return NoonDataResponse(data=[row.to_dict() for row in data], revision=revision, next_cursor=next_cursor)
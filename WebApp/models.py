@@ -1,12 +1,17 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import date
+from WebApp.logic import LADEN_BALLAST_VALUES, REPORT_SEQUENCE
+
+# Stored entries may only use the known values, like rows of a bulk import
+LadenBallast = Literal[tuple(LADEN_BALLAST_VALUES)]
+ReportType = Literal[tuple(REPORT_SEQUENCE)]
 
 class NoonEntry(BaseModel):
     Vessel_name: str
     Date: date
-    Laden_Ballst: str
-    Report_Type: str
+    Laden_Ballst: LadenBallast
+    Report_Type: ReportType
 
 class ContradictionCheckRequest(BaseModel):
     vessel_name: str
@@ -17,9 +22,12 @@ class ContradictionCheckResponse(BaseModel):
     is_contradiction: bool
     previous_status: Optional[str]
     reason: Optional[str]
+    session_id: Optional[str] = None
 
 class ChatRequest(BaseModel):
-    conversation_history: list
+    conversation_history: list = []
+    session_id: Optional[str] = None
+    message: Optional[str] = None
     vessel_name: str
     previous_status: Optional[str]
     new_status: str
@@ -30,9 +38,25 @@ class ChatResponse(BaseModel):
     action: str
     corrected_status: Optional[str] = None
     bot_response: str
+    session_id: Optional[str] = None
 
 class AddEntryRequest(BaseModel):
     entry: NoonEntry
 
 class NoonDataResponse(BaseModel):
     data: list
+    revision: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+class BulkRowReport(BaseModel):
+    row: int
+    Vessel_name: Optional[str] = None
+    Date: Optional[date] = None
+    valid: bool
+    violations: List[str] = []
+    warnings: List[str] = []
+
+class BulkImportResponse(BaseModel):
+    imported: int
+    rejected: int
+    rows: List[BulkRowReport]
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import threading
+from typing import FrozenSet, List, Optional, Tuple
+
+from WebApp.records import NoonRecord
+from WebApp.storage import storage
+from WebApp.telemetry import registry
+
+# Fan-out of committed noon reports to connected clients (the SSE feed in
+# main.py). Each client subscribes to some vessels (or all of them) and has a
+# bounded queue; a client that falls behind is not allowed to hold back the
+# writers, its backlog is dropped and it is sent a fresh snapshot instead.
+
+NOON_FEED_QUEUE_SIZE = int(os.getenv('NOON_FEED_QUEUE_SIZE', '256'))
+
+# Queued in place of a client's dropped backlog
+RESYNC = object()
+
+FEED_RESYNCS = registry.counter("noon_feed_resyncs_total", "Feed clients that fell behind and were resent a snapshot.")
+
+class FeedClient:
+    def __init__(self, vessels: Optional[FrozenSet[str]], loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.vessels = vessels
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+    def wants(self, vessel_name: str) -> bool:
+        return self.vessels is None or vessel_name in self.vessels
+
+    def push(self, rows: List[Tuple[NoonRecord, int]]):
+        # Runs on the client's event loop
+        try:
+            self.queue.put_nowait(rows)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            self.resyncs += 1
+            FEED_RESYNCS.inc()
+
+class NoonFeed:
+    def __init__(self, storage, queue_size: int = NOON_FEED_QUEUE_SIZE):
+        self.storage = storage
+        self.queue_size = queue_size
+        self._clients: Tuple[FeedClient, ...] = ()
+        self._lock = threading.Lock()
+        self._unsubscribe = None
+
+    def connect(self, vessels: Optional[List[str]] = None) -> FeedClient:
+        client = FeedClient(frozenset(vessels) if vessels else None, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if self._unsubscribe is None:
+                self._unsubscribe = self.storage.subscribe(self._on_change)
+            self._clients = self._clients + (client,)
+        return client
+
+    def disconnect(self, client: FeedClient):
+        with self._lock:
+            self._clients = tuple(c for c in self._clients if c is not client)
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def _on_change(self, changes: List[Tuple[NoonRecord, int]]):
+        # Called by DataStorage in the writing thread; only hands rows over
+        for client in self._clients:
+            rows = [change for change in changes if client.wants(change[0].vessel)]
+            if rows:
+                try:
+                    client.loop.call_soon_threadsafe(client.push, rows)
+                except RuntimeError:
+                    # The client's event loop has shut down
+                    self.disconnect(client)
+
+noon_feed = NoonFeed(storage)
+
+registry.callback("noon_feed_clients", "Clients connected to the live noon data feed.", (), lambda: {(): noon_feed.client_count})
@@ -0,0 +1,83 @@
+import sys
+import threading
+from collections.abc import Mapping
+from datetime import date
+from typing import Dict, List
+
+from WebApp.logic import LADEN_BALLAST_VALUES, REPORT_SEQUENCE
+
+# Compact stored form of a noon report. Dates are parsed once at ingest and
+# kept as ordinal days; report type and Laden/Ballast are small integer codes
+# into shared tables, and vessel names are interned. Records still read like
+# the original row dicts (row['Report_Type'], row.get('Date')), so the
+# validators work on them unchanged; to_dict() gives the JSON shape.
+
+class CodeTable:
+    def __init__(self, values):
+        self._lock = threading.Lock()
+        self.values: List[str] = list(values)
+        self._codes: Dict[str, int] = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            # Values outside the known set are still accepted, just appended;
+            # the API only lets the known ones through, so the table stays small
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)
+                    self._codes[value] = code
+        return code
+
+REPORT_TYPES = CodeTable(REPORT_SEQUENCE)
+LADEN_BALLAST = CodeTable(LADEN_BALLAST_VALUES)
+
+FIELDS = ('Vessel_name', 'Date', 'Laden_Ballst', 'Report_Type')
+
+class NoonRecord(Mapping):
+    __slots__ = ('vessel', 'day', 'laden', 'report')
+
+    def __init__(self, vessel: str, day: int, laden: int, report: int):
+        self.vessel = vessel
+        self.day = day
+        self.laden = laden
+        self.report = report
+
+    @classmethod
+    def from_entry(cls, entry, day: int) -> "NoonRecord":
+        return cls(
+            sys.intern(entry['Vessel_name']),
+            day,
+            LADEN_BALLAST.code(entry.get('Laden_Ballst')),
+            REPORT_TYPES.code(entry.get('Report_Type')),
+        )
+
+    def __getitem__(self, key):
+        if key == 'Report_Type':
+            return REPORT_TYPES.values[self.report]
+        if key == 'Laden_Ballst':
+            return LADEN_BALLAST.values[self.laden]
+        if key == 'Vessel_name':
+            return self.vessel
+        if key == 'Date':
+            return date.fromordinal(self.day)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def to_dict(self) -> Dict:
+        return {
+            'Vessel_name': self.vessel,
+            'Date': date.fromordinal(self.day),
+            'Laden_Ballst': LADEN_BALLAST.values[self.laden],
+            'Report_Type': REPORT_TYPES.values[self.report],
+        }
+
+    def __repr__(self):
+        return f"NoonRecord({self.to_dict()!r})"
@@ -11,6 +11,9 @@ const sendChatBtn = document.getElementById('sendChat');
 let contradictionState = null;
 let chatHistory = [];
 let latestVessel = null;
+let noonRows = new Map();
+let noonFeed = null;
+let feedVessel = null;
 
 function clearForm() {
     entryForm.reset();
@@ -18,12 +21,29 @@ function clearForm() {
     // document.getElementById('date').value = new Date().toISOString().split('T')[0];
 }
 
-window.addEventListener('DOMContentLoaded', async () => {
-    const data = await fetch(`/get_noon_data`).then(r => r.json());
-    renderNoonData(data.data);
+window.addEventListener('DOMContentLoaded', () => {
+    openNoonFeed(null);
     noonDataDiv.style.display = 'block';
 });
 
+function openNoonFeed(vessel) {
+    // Live table: the server sends a snapshot on connect, then only the rows
+    // that change. EventSource reconnects by itself and resumes from the last
+    // revision it saw.
+    if (noonFeed && feedVessel === vessel) return;
+    if (noonFeed) noonFeed.close();
+    feedVessel = vessel;
+    noonFeed = new EventSource(`/noon_data/stream${vessel ? `?vessel=${encodeURIComponent(vessel)}` : ''}`);
+    noonFeed.addEventListener('snapshot', e => {
+        noonRows = new Map();
+        JSON.parse(e.data).rows.forEach(row => noonRows.set(noonRowKey(row), row));
+        renderNoonData([...noonRows.values()]);
+    });
+    noonFeed.addEventListener('delta', e => {
+        JSON.parse(e.data).rows.forEach(upsertNoonRow);
+    });
+}
+
 entryForm.addEventListener('submit', async (e) => {
     e.preventDefault();
     // Hide noon data immediately when Add Entry is pressed
@@ -48,7 +68,8 @@ entryForm.addEventListener('submit', async (e) => {
     if (checkRes.is_contradiction) {
         contradictionState = {
             entry,
-            previous_status: checkRes.previous_status
+            previous_status: checkRes.previous_status,
+            session_id: checkRes.session_id
         };
         contradictionChatDiv.style.display = 'block';
         chatHistory = [{ role: 'bot', content: checkRes.reason || 'Contradiction detected. Please confirm or correct.' }];
@@ -70,14 +91,10 @@ entryForm.addEventListener('submit', async (e) => {
     }
 });
 
-showDataBtn.addEventListener('click', async () => {
+showDataBtn.addEventListener('click', () => {
     if (noonDataDiv.style.display === 'none') {
-        const data = await fetch(`/get_noon_data`).then(r => r.json());
-        let filtered = data.data;
-        if (latestVessel) {
-            filtered = filtered.filter(row => row.Vessel_name === latestVessel);
-        }
-        renderNoonData(filtered);
+        // The feed keeps the table current; only a different vessel needs a new subscription
+        openNoonFeed(latestVessel);
         noonDataDiv.style.display = 'block';
     } else {
         noonDataDiv.style.display = 'none';
@@ -95,23 +112,30 @@ chatInput.addEventListener('keydown', function(e) {
 async function sendChat() {
     const userMsg = chatInput.value.trim();
     if (!userMsg) return;
+    const earlierTurns = chatHistory.slice();
     chatHistory.push({ role: 'user', content: userMsg });
     renderChat();
     chatInput.value = '';
     chatInput.focus();
-    // Call chat_response API
-    const res = await fetch(`/chat_response`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-            conversation_history: chatHistory,
-            vessel_name: contradictionState.entry.Vessel_name,
-            previous_status: contradictionState.previous_status,
-            new_status: contradictionState.entry.Laden_Ballst,
-            new_report_type: contradictionState.entry.Report_Type
-        })
-    }).then(r => r.json());
-    chatHistory.push({ role: 'bot', content: res.bot_response });
+    // Stream the reply so the bot message fills in while it is generated
+    const botMsg = { role: 'bot', content: '' };
+    chatHistory.push(botMsg);
+    const botDiv = renderChat();
+    // The server keeps the conversation; only the new message is sent
+    const res = await streamChatResponse({
+        session_id: contradictionState.session_id,
+        message: userMsg,
+        vessel_name: contradictionState.entry.Vessel_name,
+        previous_status: contradictionState.previous_status,
+        new_status: contradictionState.entry.Laden_Ballst,
+        new_report_type: contradictionState.entry.Report_Type
+    }, earlierTurns, token => {
+        botMsg.content += token;
+        botDiv.textContent = botMsg.content;
+        chatHistoryDiv.scrollTop = chatHistoryDiv.scrollHeight;
+    });
+    botMsg.content = res.bot_response;
+    if (res.session_id) contradictionState.session_id = res.session_id;
     renderChat();
     if (res.action === 'proceed') {
         await fetch(`/add_entry`, {
@@ -142,16 +166,56 @@ async function sendChat() {
     
 }
 
+async function streamChatResponse(body, earlierTurns, onToken) {
+    // Reads the Server-Sent Events from /chat_response/stream; resolves with the final result
+    const post = body => fetch(`/chat_response/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    let response = await post(body);
+    if (response.status === 410) {
+        // The server no longer has this session; send the conversation so far once
+        response = await post({ ...body, conversation_history: earlierTurns });
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            let event = 'message';
+            let data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            if (event === 'token') onToken(JSON.parse(data).text);
+            else if (event === 'result') result = JSON.parse(data);
+        }
+    }
+    return result || { action: 'clarify', bot_response: "I'm sorry, I couldn't process that. Please try again." };
+}
+
 function renderChat() {
     chatHistoryDiv.innerHTML = '';
+    let div = null;
     chatHistory.forEach(msg => {
-        const div = document.createElement('div');
+        div = document.createElement('div');
         div.className = 'chat-msg ' + msg.role;
         div.textContent = msg.content;
         chatHistoryDiv.appendChild(div);
-        setTimeout(() => { div.style.opacity = 1; }, 10);
+        const shown = div;
+        setTimeout(() => { shown.style.opacity = 1; }, 10);
     });
     chatHistoryDiv.scrollTop = chatHistoryDiv.scrollHeight;
+    return div;
 }
 
 function renderNoonData(data) {
@@ -159,10 +223,44 @@ function renderNoonData(data) {
         noonDataDiv.innerHTML = '<em>No data available.</em>';
         return;
     }
-    let html = '<table class="table table-bordered"><thead><tr><th>Vessel</th><th>Date</th><th>Laden/Ballast</th><th>Report Type</th></tr></thead><tbody>';
-    data.forEach(row => {
-        html += `<tr><td>${row.Vessel_name}</td><td>${row.Date}</td><td>${row.Laden_Ballst}</td><td>${row.Report_Type}</td></tr>`;
+    noonDataDiv.innerHTML = '<table class="table table-bordered"><thead><tr><th>Vessel</th><th>Date</th><th>Laden/Ballast</th><th>Report Type</th></tr></thead><tbody></tbody></table>';
+    const tbody = noonDataDiv.querySelector('tbody');
+    data.forEach(row => tbody.appendChild(noonRowElement(row)));
+}
+
+function noonRowKey(row) {
+    // Sorts like the server: by vessel name, then date
+    return `${row.Vessel_name}\u0000${row.Date}`;
+}
+
+function noonRowElement(row) {
+    const tr = document.createElement('tr');
+    tr.dataset.key = noonRowKey(row);
+    [row.Vessel_name, row.Date, row.Laden_Ballst, row.Report_Type].forEach(value => {
+        const td = document.createElement('td');
+        td.textContent = value;
+        tr.appendChild(td);
     });
-    html += '</tbody></table>';
-    noonDataDiv.innerHTML = html;
+    return tr;
+}
+
+function upsertNoonRow(row) {
+    const key = noonRowKey(row);
+    const isNew = !noonRows.has(key);
+    noonRows.set(key, row);
+    const tbody = noonDataDiv.querySelector('tbody');
+    if (!tbody) {
+        renderNoonData([...noonRows.values()].sort((a, b) => noonRowKey(a) < noonRowKey(b) ? -1 : 1));
+        return;
+    }
+    const tr = noonRowElement(row);
+    if (!isNew) {
+        const existing = [...tbody.rows].find(r => r.dataset.key === key);
+        if (existing) {
+            tbody.replaceChild(tr, existing);
+            return;
+        }
+    }
+    const next = [...tbody.rows].find(r => r.dataset.key > key);
+    tbody.insertBefore(tr, next || null);
 }
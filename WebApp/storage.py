@@ -1,14 +1,100 @@
+import atexit
+import base64
+import json
+import os
 import threading
-from typing import List, Dict
+import time
+from bisect import bisect_left, bisect_right
+from typing import Callable, List, Dict, Iterable, Optional, Sequence, Tuple
 from datetime import date, datetime, timedelta
 import random
+from array import array
+from WebApp.backends import MemoryBackend, SQLiteBackend
+from WebApp.logic import VoyageState
+from WebApp.records import NoonRecord
+from WebApp.telemetry import registry, span, timed_lock
+
+DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%dT%H:%M:%S")
+
+def parse_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    raise ValueError(f"Unrecognised date: {value!r}")
+
+def encode_cursor(vessel_name: str, row_date: date) -> str:
+    raw = json.dumps([vessel_name, row_date.isoformat()]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor: str) -> Tuple[str, date]:
+    try:
+        vessel_name, row_date = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return vessel_name, date.fromisoformat(row_date)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def boot_revision() -> int:
+    # Microseconds since the epoch. A store that starts out empty numbers its
+    # rows from here, so revisions handed out by an earlier run (cached ETags,
+    # `since` cursors, Last-Event-ID) are always lower than this run's: that
+    # run used one revision per write, and a write takes well over a microsecond.
+    return time.time_ns() // 1000
+
+# Immutable history of one vessel: NoonRecords in date order with parallel
+# arrays of their ordinal days and revisions, plus the voyage state after the
+# last row. The arrays are never modified once the history is published.
+class VesselHistory:
+    __slots__ = ("rows", "days", "revs", "state", "revision")
+
+    def __init__(self, rows=(), days=None, revs=None, state=None, revision=0):
+        self.rows = rows
+        self.days = days if days is not None else array('l')
+        self.revs = revs if revs is not None else array('q')
+        self.state = state or VoyageState()
+        self.revision = revision
+
+# A published version of the whole store. Neither the snapshot, its vessel
+# map nor anything reachable from it is modified once published.
+class Snapshot:
+    __slots__ = ("vessels", "revision")
+
+    def __init__(self, vessels=None, revision=0):
+        self.vessels: Dict[str, VesselHistory] = vessels or {}
+        self.revision = revision
 
 # In-memory storage for demo (thread-safe)
+# Rows are indexed per vessel and kept in date order, so an upsert is a
+# bisect on that vessel's dates instead of a scan over the whole fleet.
+# An optional backend persists every upsert and seeds the index at startup.
+# Every upsert also bumps a storage-wide revision number that is recorded on
+# the row, so clients can ask for "what changed since revision N".
+#
+# Reads never lock: they grab the current Snapshot and work on it. Writers
+# serialize on a lock, build copy-on-write replacements for the vessels they
+# touch and publish a new Snapshot with a single attribute assignment.
+#
+# With a shared backend several worker processes write the same store. Every
+# write first catches up on rows the other workers committed, so revisions stay
+# global, and a watcher thread polls the backend to pull in their writes between
+# requests. Subscribers are told about every change, local or not.
 class DataStorage:
-    def __init__(self):
+    def __init__(self, backend=None, poll_interval: float = 0.2):
         self._lock = threading.Lock()
-        self._data = []
+        self._backend = backend or MemoryBackend()
+        self._snapshot = Snapshot()
         self._initialized = False
+        self._revision_floor = 0
+        self.poll_interval = poll_interval
+        self._subscribers: List[Callable[[List[Tuple[NoonRecord, int]]], None]] = []
+        self._subscribers_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
 
     def generate_dummy_data(self):
         data = []
@@ -33,57 +119,315 @@ class DataStorage:
         return data
 
     def initialize(self):
+        # Loads the backend (or seeds the demo data) once; called lazily by the
+        # first read or write, or ahead of time by the app's startup warm-up
         with self._lock:
-            if not self._initialized:
-                self._data = self.generate_dummy_data()
-                self._initialized = True
+            if self._initialized:
+                return
+            if self._backend.shared:
+                # Baseline for changed(); later commits are caught up by revision
+                self._backend.changed()
+            grouped: Dict[str, Tuple[List[NoonRecord], List[int]]] = {}
+            for row, revision in self._backend.load():
+                # Backend rows arrive sorted by vessel and date, so append directly.
+                rows, revs = grouped.setdefault(row['Vessel_name'], ([], []))
+                rows.append(NoonRecord.from_entry(row, row['Date'].toordinal()))
+                revs.append(revision)
+            if grouped:
+                vessels = {
+                    vessel_name: VesselHistory(
+                        tuple(rows), array('l', (row.day for row in rows)), array('q', revs),
+                        VoyageState.from_history(rows), max(revs),
+                    )
+                    for vessel_name, (rows, revs) in grouped.items()
+                }
+                self._snapshot = Snapshot(vessels, max(h.revision for h in vessels.values()))
+            elif self._backend.shared:
+                # Another worker may have seeded the store since load()
+                self._write_shared(self.generate_dummy_data(), if_empty=True)
+            else:
+                self._snapshot = self._fresh_snapshot()
+                self._revision_floor = self._snapshot.revision
+                self._backend.write_many(self._write(self.generate_dummy_data()))
+            self._initialized = True
+            if self._backend.shared and self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="noon-storage-watcher", daemon=True)
+                self._watcher.start()
+
+    @staticmethod
+    def _apply(history: VesselHistory, items: List[Tuple[Dict, int]]) -> Tuple[VesselHistory, List[Tuple[NoonRecord, int]]]:
+        # Builds the vessel's next history from mutable copies, frozen once per batch
+        rows = list(history.rows)
+        days = array('l', history.days)
+        revs = array('q', history.revs)
+        state = history.state
+        replay = False
+        written = []
+        for entry, revision in items:
+            day = parse_date(entry['Date']).toordinal()
+            idx = bisect_left(days, day)
+            if idx < len(days) and days[idx] == day:
+                # Update the entry fields on a fresh record; readers may still hold the old one
+                old = rows[idx]
+                record = NoonRecord.from_entry({
+                    'Vessel_name': old.vessel,
+                    'Laden_Ballst': entry.get('Laden_Ballst', old['Laden_Ballst']),
+                    'Report_Type': entry.get('Report_Type', old['Report_Type']),
+                }, day)
+                rows[idx] = record
+                revs[idx] = revision
+                replay = True
+            else:
+                record = NoonRecord.from_entry(entry, day)
+                rows.insert(idx, record)
+                days.insert(idx, day)
+                revs.insert(idx, revision)
+                if idx == len(rows) - 1 and not replay:
+                    # Appending the latest report folds it into the voyage state in O(1)
+                    state = state.advance(record)
+                else:
+                    replay = True
+            written.append((record, revision))
+        if replay:
+            # Back-dated inserts and in-place updates rewrite history, so replay it
+            state = VoyageState.from_history(rows)
+        return VesselHistory(tuple(rows), days, revs, state, written[-1][1]), written
+
+    @classmethod
+    def _merge(cls, snapshot: Snapshot, items: List[Tuple[Dict, int]]) -> Tuple[Snapshot, List[Tuple[NoonRecord, int]]]:
+        # Applies already-numbered entries; copies the vessel map once per batch
+        vessels = dict(snapshot.vessels)
+        by_vessel: Dict[str, List[Tuple[Dict, int]]] = {}
+        for entry, revision in items:
+            by_vessel.setdefault(entry['Vessel_name'], []).append((entry, revision))
+        written = []
+        for vessel_name, vessel_items in by_vessel.items():
+            vessels[vessel_name], vessel_written = cls._apply(vessels.get(vessel_name) or VesselHistory(), vessel_items)
+            written.extend(vessel_written)
+        written.sort(key=lambda item: item[1])
+        return Snapshot(vessels, max([snapshot.revision] + [revision for _, revision in items])), written
+
+    def _fresh_snapshot(self) -> Snapshot:
+        # For a store found empty: number its rows from this run's base
+        return Snapshot({}, max(self._snapshot.revision, boot_revision()))
+
+    @staticmethod
+    def _number(snapshot: Snapshot, entries: List[Dict]) -> List[Tuple[Dict, int]]:
+        return [(entry, snapshot.revision + i) for i, entry in enumerate(entries, 1)]
+
+    def _write(self, entries: List[Dict]) -> List[Tuple[NoonRecord, int]]:
+        # Caller holds self._lock
+        self._snapshot, written = self._merge(self._snapshot, self._number(self._snapshot, entries))
+        return written
+
+    def _catch_up(self) -> List[Tuple[NoonRecord, int]]:
+        # Caller holds self._lock. Pulls in rows other processes committed.
+        rows = self._backend.load_since(self._snapshot.revision)
+        if not rows:
+            return []
+        self._snapshot, changes = self._merge(self._snapshot, rows)
+        return changes
+
+    def _stale(self, expected: Dict[str, int]) -> bool:
+        # Caller holds self._lock. True when any of the vessels moved past the
+        # revision the caller last saw (0 for a vessel it saw no rows for).
+        vessels = self._snapshot.vessels
+        return any((vessels[name].revision if name in vessels else 0) != revision for name, revision in expected.items())
+
+    def _write_shared(self, entries: List[Dict], if_empty: bool = False,
+                      expected: Optional[Dict[str, int]] = None) -> Tuple[List[Tuple[NoonRecord, int]], bool]:
+        # Caller holds self._lock. The snapshot is only published once the
+        # rows are committed, numbered after everything any process wrote.
+        # Returns (changes, whether `entries` were written).
+        with self._backend.transaction():
+            changes = self._catch_up()
+            if (if_empty and self._snapshot.vessels) or (expected is not None and self._stale(expected)):
+                return changes, False
+            base = self._fresh_snapshot() if if_empty else self._snapshot
+            snapshot, written = self._merge(base, self._number(base, entries))
+            self._backend.write_many(written)
+        self._snapshot = snapshot
+        if if_empty:
+            self._revision_floor = base.revision
+        return changes + written, True
+
+    def _notify(self, changes: List[Tuple[NoonRecord, int]]):
+        # Runs under self._lock so subscribers see changes in revision order;
+        # callbacks must hand off their work rather than block.
+        for callback in self._subscribers:
+            try:
+                callback(changes)
+            except Exception:
+                pass
+
+    def subscribe(self, callback: Callable[[List[Tuple[NoonRecord, int]]], None]) -> Callable[[], None]:
+        # callback(changes) receives the (record, revision) pairs of each
+        # committed change; returns a function that unsubscribes it
+        with self._subscribers_lock:
+            self._subscribers = self._subscribers + [callback]
+
+        def unsubscribe():
+            with self._subscribers_lock:
+                self._subscribers = [cb for cb in self._subscribers if cb is not callback]
+        return unsubscribe
+
+    def refresh(self):
+        # Cheap when nothing changed: one PRAGMA on the shared backend
+        if not self._initialized or not self._backend.shared or not self._backend.changed():
+            return
+        with timed_lock(self._lock, "storage_write"):
+            try:
+                changes = self._catch_up()
+            except Exception:
+                self._backend.invalidate()
+                raise
+            if changes:
+                self._notify(changes)
+
+    def _watch(self):
+        while not self._closed.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception:
+                # e.g. the database is busy; the next tick tries again
+                continue
+
+    @property
+    def initialized(self) -> bool:
+        return self._initialized
+
+    def _ready(self) -> Snapshot:
+        if not self._initialized:
+            self.initialize()
+        return self._snapshot
 
     def add_entry(self, entry: Dict):
-        with self._lock:
-            vessel_name = entry['Vessel_name']
-            entry_date = entry['Date']
-            # Convert date string to date for comparison
-            if isinstance(entry_date, str):
-                try:
-                    entry_date_obj = datetime.strptime(entry_date, "%Y-%m-%d").date()
-                except Exception:
-                    entry_date_obj = entry_date
+        self._ready()
+        with timed_lock(self._lock, "storage_write"), span("storage.write"):
+            if self._backend.shared:
+                changes, _ = self._write_shared([entry])
             else:
-                entry_date_obj = entry_date
-            # Check for existing entry for this vessel and date
-            updated = False
-            for row in self._data:
-                if row['Vessel_name'] == vessel_name:
-                    # Ensure row['Date'] is a date
-                    if isinstance(row['Date'], str):
-                        try:
-                            row['Date'] = datetime.strptime(row['Date'], "%Y-%m-%d").date()
-                        except Exception:
-                            pass
-                    if row['Date'] == entry_date_obj:
-                        # Update the entry fields
-                        row['Laden_Ballst'] = entry.get('Laden_Ballst', row.get('Laden_Ballst'))
-                        row['Report_Type'] = entry.get('Report_Type', row.get('Report_Type'))
-                        updated = True
-                        break
-            if not updated:
-                # Add as new entry
-                entry['Date'] = entry_date_obj
-                self._data.append(entry)
-            # Sort vessel entries by date (descending)
-            vessel_entries = [row for row in self._data if row['Vessel_name'] == vessel_name]
-            vessel_entries.sort(key=lambda x: x['Date'], reverse=False)
-            self._data = [row for row in self._data if row['Vessel_name'] != vessel_name]
-            self._data.extend(vessel_entries)
-
-    def get_data(self) -> List[Dict]:
+                changes = self._write([entry])
+                self._backend.write(*changes[0])
+            self._notify(changes)
+
+    def add_entries(self, entries: List[Dict], expected: Optional[Dict[str, int]] = None) -> bool:
+        # Upsert a batch and persist it as a single backend transaction. With
+        # `expected` ({vessel: revision} the entries were validated against)
+        # nothing is written, and False returned, if any of those vessels has
+        # changed since.
+        self._ready()
+        with timed_lock(self._lock, "storage_write"), span("storage.write"):
+            if self._backend.shared:
+                changes, written = self._write_shared(entries, expected=expected)
+            elif expected is not None and self._stale(expected):
+                return False
+            else:
+                changes, written = self._write(entries), True
+                self._backend.write_many(changes)
+            if changes:
+                self._notify(changes)
+            return written
+
+    def snapshot(self) -> Snapshot:
+        return self._ready()
+
+    def get_vessel_history(self, vessel_name: str, last_n: Optional[int] = None) -> Sequence[NoonRecord]:
+        history = self._ready().vessels.get(vessel_name)
+        rows = history.rows if history else ()
+        if last_n is not None:
+            return rows[-last_n:] if last_n > 0 else ()
+        return rows
+
+    def get_voyage_state(self, vessel_name: str) -> VoyageState:
+        history = self._ready().vessels.get(vessel_name)
+        return history.state if history else VoyageState()
+
+    def get_vessel_names(self) -> List[str]:
+        return list(self._ready().vessels)
+
+    def get_data(self) -> List[NoonRecord]:
+        return [row for history in self._ready().vessels.values() for row in history.rows]
+
+    @property
+    def revision(self) -> int:
+        return self._ready().revision
+
+    @property
+    def revision_floor(self) -> int:
+        # Revisions below this were handed out before this store's rows existed
+        self._ready()
+        return self._revision_floor
+
+    def query(self, vessels: Optional[Iterable[str]] = None, date_from: Optional[date] = None,
+              date_to: Optional[date] = None, since: Optional[int] = None, cursor: Optional[str] = None,
+              limit: Optional[int] = None) -> Tuple[List[NoonRecord], Optional[str], int]:
+        # Rows ordered by vessel name then date. Returns (rows, next_cursor, revision);
+        # next_cursor is set when `limit` cut the page short.
+        with span("storage.query"):
+            return self._query(vessels, date_from, date_to, since, cursor, limit)
+
+    def _query(self, vessels, date_from, date_to, since, cursor, limit):
+        after_vessel, after_date = decode_cursor(cursor) if cursor else (None, None)
+        snapshot = self._ready()
+        out: List[NoonRecord] = []
+        names = sorted(snapshot.vessels if vessels is None else set(vessels) & snapshot.vessels.keys())
+        for vessel_name in names:
+            if after_vessel is not None and vessel_name < after_vessel:
+                continue
+            history = snapshot.vessels[vessel_name]
+            if since is not None and history.revision <= since:
+                continue
+            rows, days, revs = history.rows, history.days, history.revs
+            start = bisect_left(days, date_from.toordinal()) if date_from else 0
+            if vessel_name == after_vessel:
+                start = max(start, bisect_right(days, after_date.toordinal()))
+            end = bisect_right(days, date_to.toordinal()) if date_to else len(days)
+            for i in range(start, end):
+                if since is not None and revs[i] <= since:
+                    continue
+                if limit is not None and len(out) >= limit:
+                    last = out[-1]
+                    return out, encode_cursor(last.vessel, last['Date']), snapshot.revision
+                out.append(rows[i])
+        return out, None, snapshot.revision
+
+    def flush(self):
+        self._backend.flush()
+
+    def close(self):
+        self._closed.set()
         with self._lock:
-            return list(self._data)
+            self._backend.close()
 
     def clear(self):
         with self._lock:
-            self._data = []
+            # Keep the revision monotonic so cached ETags never match again
+            self._snapshot = Snapshot({}, self._snapshot.revision)
             self._initialized = False
 
-storage = DataStorage()
-storage.initialize()
+def create_storage() -> DataStorage:
+    # NOON_DB_PATH enables the SQLite backend; without it data lives only in memory.
+    db_path = os.getenv('NOON_DB_PATH')
+    if not db_path:
+        return DataStorage()
+    # Shared by default so `uvicorn --workers N` processes see each other's
+    # writes; NOON_DB_SHARED=0 restores single-process batched writes.
+    backend = SQLiteBackend(
+        db_path,
+        batch_size=int(os.getenv('NOON_DB_BATCH_SIZE', '1')),
+        flush_interval=float(os.getenv('NOON_DB_FLUSH_INTERVAL', '1.0')),
+        shared=os.getenv('NOON_DB_SHARED', '1').lower() not in ('0', 'false', 'no'),
+    )
+    return DataStorage(backend, poll_interval=float(os.getenv('NOON_DB_POLL_INTERVAL', '0.2')))
+
+# Created at import, loaded on first use (see DataStorage.initialize)
+storage = create_storage()
+atexit.register(storage.close)
+
+def _storage_size():
+    snapshot = storage.snapshot()
+    return {('vessels',): len(snapshot.vessels), ('rows',): sum(len(h.rows) for h in snapshot.vessels.values())}
+
+registry.callback("noon_storage_revision", "Latest storage revision.", (), lambda: {(): storage.revision})
+registry.callback("noon_storage_size", "Vessels and noon reports held in the current snapshot.", ("kind",), _storage_size)
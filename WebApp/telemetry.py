@@ -0,0 +1,253 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Process-local metrics in the Prometheus text format, per-request stage spans
+# (also returned to the caller as a Server-Timing header) and a sampling
+# profiler that can be switched on and off while the app is running.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {value}" for key, value in values]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket..., +Inf count, sum]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        lines = []
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {counts[-1]}")
+        return lines
+
+class CallbackMetric(_Metric):
+    # Read at scrape time from a callback returning {label values tuple: value},
+    # for values another module already keeps (cache stats, storage size, ...)
+    def __init__(self, name, help, labels=(), collect: Callable[[], Dict[Tuple, float]] = dict, kind: str = "gauge"):
+        super().__init__(name, help, labels)
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self):
+        return [f"{self.name}{_labels(self.label_names, key)} {value}" for key, value in sorted(self.collect().items())]
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Re-registering a name returns the existing metric (e.g. on module reload)
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labels=()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name, help, labels=(), collect=dict, kind="gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, labels, collect, kind))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # A failing gauge callback must not take the whole scrape down
+                continue
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+REQUESTS = registry.counter("noon_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+REQUEST_DURATION = registry.histogram("noon_http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+STAGE_DURATION = registry.histogram("noon_stage_duration_seconds", "Time spent in each instrumented stage.", ("stage",))
+LOCK_WAIT = registry.histogram("noon_lock_wait_seconds", "Time spent waiting to acquire a lock or semaphore.", ("lock",))
+LLM_CALLS = registry.counter("noon_llm_calls_total", "Gemini calls by kind and outcome.", ("kind", "outcome"))
+LLM_PROMPT_CHARS = registry.histogram("noon_llm_prompt_chars", "Prompt size in characters.", ("kind",), SIZE_BUCKETS)
+
+# Stages recorded for the current request, as (name, seconds)
+_trace: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('noon_trace', default=None)
+
+def start_trace() -> List[Tuple[str, float]]:
+    trace: List[Tuple[str, float]] = []
+    _trace.set(trace)
+    return trace
+
+def record_stage(stage: str, seconds: float):
+    STAGE_DURATION.observe(seconds, stage=stage)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((stage, seconds))
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+@contextmanager
+def timed_lock(lock, name: str):
+    start = time.perf_counter()
+    with lock:
+        LOCK_WAIT.observe(time.perf_counter() - start, lock=name)
+        yield
+
+def server_timing(trace: List[Tuple[str, float]]) -> str:
+    # Repeated stages (e.g. two model calls) are summed into one entry
+    totals: Dict[str, float] = {}
+    for stage, seconds in trace:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage.replace('.', '-')};dur={seconds * 1000:.2f}" for stage, seconds in totals.items())
+
+class SamplingProfiler:
+    # Samples every thread's stack at a fixed interval and keeps collapsed
+    # stacks ("frame;frame;frame count"), the input format of flamegraph tools.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks: _Tally = _Tally()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.interval = 0.01
+        self.samples = 0
+        self.started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.01, reset: bool = True):
+        with self._lock:
+            if self.running:
+                return
+            if reset:
+                self._stacks.clear()
+                self.samples = 0
+            self.interval = interval
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="noon-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            stacks = []
+            for thread_id, frame in frames.items():
+                if thread_id == own:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(names)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'running': self.running,
+                'interval': self.interval,
+                'samples': self.samples,
+                'started_at': self.started_at,
+            }
+
+    def collapsed(self, limit: Optional[int] = None) -> str:
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+profiler = SamplingProfiler()
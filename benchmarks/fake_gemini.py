@@ -0,0 +1,66 @@
+"""Offline stand-in for google.generativeai.GenerativeModel.
+
+Replies after a configurable latency and fails a configurable fraction of
+calls, which is enough to exercise the cache, deadlines and fallbacks in
+gemini_api.py without network access or an API key.
+"""
+import asyncio
+import json
+import random
+
+CHAT_REPLY = {"action": "clarify", "bot_response": "The vessel was Laden in its recent reports; could you confirm the new status?"}
+INITIAL_REPLY = "Hey Master, I noticed a change in the Laden/Ballast status. Would you like to review this change?"
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeStream:
+    def __init__(self, text, chunk_size, delay):
+        self._text = text
+        self._chunk_size = chunk_size
+        self._delay = delay
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for i in range(0, len(self._text), self._chunk_size):
+            await asyncio.sleep(self._delay)
+            yield FakeResponse(self._text[i:i + self._chunk_size])
+
+class FakeGenerativeModel:
+    def __init__(self, latency=0.3, jitter=0.1, failure_rate=0.0, stream_chunk_size=16, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.stream_chunk_size = stream_chunk_size
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def _delay(self):
+        return max(0.0, self._random.gauss(self.latency, self.jitter))
+
+    def _reply(self, prompt):
+        self.calls += 1
+        if self._random.random() < self.failure_rate:
+            raise RuntimeError("fake model failure")
+        # Chat prompts ask for JSON; the initial contradiction prompts want prose
+        if "Respond ONLY with a JSON object" in prompt:
+            return "```json\n" + json.dumps(CHAT_REPLY) + "\n```"
+        return INITIAL_REPLY
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        delay = self._delay()
+        if stream:
+            text = self._reply(prompt)
+            chunks = max(1, len(text) // self.stream_chunk_size)
+            return FakeStream(text, self.stream_chunk_size, delay / chunks)
+        await asyncio.sleep(delay)
+        return FakeResponse(self._reply(prompt))
+
+def install_fake_model(**kwargs):
+    from WebApp import gemini_api
+    fake = FakeGenerativeModel(**kwargs)
+    gemini_api.set_model(fake)
+    return fake
@@ -0,0 +1,51 @@
+"""Synthetic fleet histories: generate_dummy_data scaled to many vessels.
+
+Every vessel follows valid voyages (sea passage, arrival, berth, port days,
+departure) and switches Laden/Ballast when leaving the berth, so the rows pass
+the report sequence and Laden/Ballast change rules the way real reports would.
+"""
+import random
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional
+
+def vessel_names(vessels: int) -> List[str]:
+    return [f"Navig8 {i:04d}" for i in range(vessels)]
+
+def voyage_reports(days: int, rng: random.Random) -> Iterator[tuple]:
+    status = rng.choice(['Laden', 'Ballast'])
+    produced = 0
+    while True:
+        port_call = (
+            ['At Sea'] * rng.randint(3, 12)
+            + ['Arrival', 'Arrival At Berth']
+            + ['In Port'] * rng.randint(1, 4)
+            + ['Departure From Berth', 'Departure']
+        )
+        for report_type in port_call:
+            if produced == days:
+                return
+            if report_type == 'Departure From Berth' and rng.random() < 0.5:
+                # Loaded or discharged alongside; the new status is first reported on leaving the berth
+                status = 'Ballast' if status == 'Laden' else 'Laden'
+            yield report_type, status
+            produced += 1
+
+def generate_fleet(vessels: int = 1000, days: int = 365, end: Optional[date] = None, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    end = end or date.today() - timedelta(days=1)
+    start = end - timedelta(days=days - 1)
+    entries = []
+    for name in vessel_names(vessels):
+        for i, (report_type, status) in enumerate(voyage_reports(days, rng)):
+            entries.append({
+                'Vessel_name': name,
+                'Date': start + timedelta(days=i),
+                'Laden_Ballst': status,
+                'Report_Type': report_type,
+            })
+    return entries
+
+def load_fleet(storage, vessels: int = 1000, days: int = 365, seed: int = 0) -> int:
+    entries = generate_fleet(vessels, days, seed=seed)
+    storage.add_entries(entries)
+    return len(entries)
@@ -0,0 +1,132 @@
+"""Load generator for the FastAPI endpoints: latency percentiles and throughput.
+
+Runs against a live server with --url, or in process against WebApp.main
+with the fake Gemini model and a synthetic fleet (no API key needed):
+
+    python -m benchmarks.loadgen --requests 2000 --concurrency 50
+    python -m benchmarks.loadgen --url http://localhost:8000 --endpoint get_noon_data
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from benchmarks.fleet import vessel_names
+
+def scenarios(vessels, rng):
+    names = vessel_names(vessels)
+    day = [date.today()]
+
+    def get_noon_data():
+        return 'GET', '/get_noon_data', {'params': {'vessel': rng.choice(names), 'limit': 100}}
+
+    def get_noon_data_full():
+        return 'GET', '/get_noon_data', {}
+
+    def check_contradiction():
+        return 'POST', '/check_contradiction', {'json': {
+            'vessel_name': rng.choice(names),
+            'new_laden_ballast': rng.choice(['Laden', 'Ballast']),
+            'new_report_type': rng.choice(['At Sea', 'Arrival', 'In Port', 'Departure']),
+        }}
+
+    def chat_response():
+        # A question is never resolved locally, so every request reaches the model
+        return 'POST', '/chat_response', {'json': {
+            'conversation_history': [{'role': 'user', 'content': f"Why was the status flagged on voyage {rng.randint(0, 10**6)}?"}],
+            'vessel_name': rng.choice(names),
+            'previous_status': 'Laden',
+            'new_status': 'Ballast',
+            'new_report_type': 'At Sea',
+        }}
+
+    def add_entry():
+        day[0] += timedelta(days=1)
+        return 'POST', '/add_entry', {'json': {'entry': {
+            'Vessel_name': rng.choice(names),
+            'Date': day[0].isoformat(),
+            'Laden_Ballst': 'Laden',
+            'Report_Type': 'At Sea',
+        }}}
+
+    return {
+        'get_noon_data': get_noon_data,
+        'get_noon_data_full': get_noon_data_full,
+        'check_contradiction': check_contradiction,
+        'chat_response': chat_response,
+        'add_entry': add_entry,
+    }
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+async def run_endpoint(client, make_request, requests, concurrency):
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, path, kwargs = make_request()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return sorted(latencies), errors, time.perf_counter() - start
+
+def in_process_app(vessels, days, latency, failure_rate):
+    from benchmarks.fake_gemini import install_fake_model
+    install_fake_model(latency=latency, jitter=latency / 4, failure_rate=failure_rate)
+    from WebApp.main import app
+    from WebApp.storage import storage
+    from benchmarks.fleet import load_fleet
+    load_fleet(storage, vessels, days)
+    return app
+
+async def main_async(args):
+    if args.url:
+        transport, base_url = None, args.url
+    else:
+        app = in_process_app(args.vessels, args.days, args.llm_latency, args.llm_failure_rate)
+        transport, base_url = httpx.ASGITransport(app=app), 'http://loadgen'
+    rng = random.Random(args.seed)
+    available = scenarios(args.vessels, rng)
+    selected = args.endpoint or ['get_noon_data', 'check_contradiction', 'chat_response', 'add_entry']
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        print(f"{'endpoint':>20} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name in selected:
+            latencies, errors, elapsed = await run_endpoint(client, available[name], args.requests, args.concurrency)
+            print(f"{name:>20} {len(latencies):>9} {errors:>7} {len(latencies) / elapsed:>9.1f} "
+                  f"{percentile(latencies, 50) * 1e3:>9.2f} {percentile(latencies, 95) * 1e3:>9.2f} {percentile(latencies, 99) * 1e3:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help="Target a running server instead of the in-process app")
+    parser.add_argument('--endpoint', action='append', choices=['get_noon_data', 'get_noon_data_full', 'check_contradiction', 'chat_response', 'add_entry'],
+                        help="Endpoint scenario to run (repeatable; default: all but get_noon_data_full)")
+    parser.add_argument('--requests', type=int, default=1000, help="Requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--vessels', type=int, default=1000, help="Synthetic fleet size (in-process mode)")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--llm-latency', type=float, default=0.3, help="Fake Gemini latency in seconds")
+    parser.add_argument('--llm-failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == '__main__':
+    main()
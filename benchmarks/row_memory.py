@@ -0,0 +1,61 @@
+"""Bytes per stored noon report: plain row dicts vs DataStorage's NoonRecords.
+
+    python -m benchmarks.row_memory --rows 1000000 --vessels 500
+"""
+import argparse
+import gc
+import tracemalloc
+from datetime import date, timedelta
+
+from WebApp.logic import REPORT_SEQUENCE
+from WebApp.storage import DataStorage
+
+def make_entries(rows, vessels):
+    start = date(2020, 1, 1)
+    per_vessel = rows // vessels
+    for v in range(vessels):
+        name = f"Vessel {v:04d}"
+        for i in range(per_vessel):
+            yield {
+                'Vessel_name': name,
+                'Date': (start + timedelta(days=i)).isoformat(),
+                'Laden_Ballst': 'Laden' if (i // 30) % 2 else 'Ballast',
+                'Report_Type': REPORT_SEQUENCE[i % len(REPORT_SEQUENCE)],
+            }
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return kept, after - before
+
+def dict_rows(rows, vessels):
+    # The pre-record representation: one dict per row with a parsed date
+    out = []
+    for entry in make_entries(rows, vessels):
+        entry['Date'] = date.fromisoformat(entry['Date'])
+        out.append(entry)
+    return out
+
+def record_rows(rows, vessels):
+    storage = DataStorage()
+    storage.add_entries(list(make_entries(rows, vessels)))
+    return storage
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--vessels', type=int, default=500)
+    args = parser.parse_args()
+    rows = args.rows - args.rows % args.vessels
+    for label, build in (('dict rows', dict_rows), ('NoonRecord storage', record_rows)):
+        kept, used = measure(lambda: build(rows, args.vessels))
+        print(f"{label:>20}: {used / rows:8.1f} bytes/row ({used / 2**20:8.1f} MiB for {rows} rows)")
+        del kept
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Cold-start cost: import time of WebApp.main and latency of the first requests.
+
+Each run starts a fresh interpreter, so nothing is warm:
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --with-llm   # uses GOOGLE_API_KEY from the environment
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+def run_env(with_llm):
+    env = dict(os.environ)
+    if not with_llm:
+        env['LLM_DISABLED'] = '1'
+    return env
+
+def import_time(env, top):
+    # -X importtime reports cumulative microseconds per module on stderr
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import WebApp.main'],
+                          env=env, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            # What WebApp.main (and site) import directly; deeper imports are in these totals
+            modules.append((int(cumulative) / 1e6, name.strip()))
+    return elapsed, sorted(modules, reverse=True)[:top]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def request(url, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'} if data else {})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=30) as response:
+        response.read()
+    return time.perf_counter() - start
+
+def first_requests(env):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'WebApp.main:app', '--port', str(port), '--log-level', 'warning'], env=env)
+    try:
+        while True:
+            try:
+                request(base + '/healthz')
+                break
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                time.sleep(0.01)
+        results = {'time_to_first_byte': time.perf_counter() - start}
+        results['first /'] = request(base + '/')
+        results['first /check_contradiction'] = request(base + '/check_contradiction', {
+            'vessel_name': 'Navig8 Messi', 'new_laden_ballast': 'Ballast', 'new_report_type': 'At Sea',
+        })
+        results['first /get_noon_data'] = request(base + '/get_noon_data')
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=8, help="Slowest direct imports to list")
+    parser.add_argument('--with-llm', action='store_true', help="Keep the Gemini client enabled (needs GOOGLE_API_KEY)")
+    args = parser.parse_args()
+    env = run_env(args.with_llm)
+
+    imports, modules = [], []
+    timings = {}
+    for _ in range(args.runs):
+        elapsed, modules = import_time(env, args.top)
+        imports.append(elapsed)
+        for name, seconds in first_requests(env).items():
+            timings.setdefault(name, []).append(seconds)
+
+    print(f"{'import WebApp.main (process)':>32}: {statistics.median(imports) * 1e3:9.1f} ms median of {args.runs}")
+    for name, values in timings.items():
+        print(f"{name:>32}: {statistics.median(values) * 1e3:9.1f} ms median of {args.runs}")
+    print("\nslowest imports under WebApp.main (last run):")
+    for seconds, name in modules:
+        print(f"{name:>32}: {seconds * 1e3:9.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Microbenchmarks for the validators in logic.py and DataStorage operations.
+
+    pip install -r benchmarks/requirements.txt
+    BENCH_VESSELS=1000 BENCH_DAYS=365 python -m pytest benchmarks/test_micro.py
+
+pytest-benchmark picks the number of rounds and reports min/mean/stddev per
+case; add --benchmark-autosave and --benchmark-compare to track changes.
+"""
+import os
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from WebApp import logic
+from WebApp.storage import DataStorage
+from benchmarks.fleet import generate_fleet, vessel_names
+
+VESSELS = int(os.getenv('BENCH_VESSELS', '1000'))
+DAYS = int(os.getenv('BENCH_DAYS', '365'))
+
+@pytest.fixture(scope='module')
+def storage():
+    storage = DataStorage()
+    storage.add_entries(generate_fleet(VESSELS, DAYS))
+    return storage
+
+@pytest.fixture(scope='module')
+def vessel():
+    return vessel_names(VESSELS)[VESSELS // 2]
+
+@pytest.fixture(scope='module')
+def history(storage, vessel):
+    return storage.get_vessel_history(vessel)
+
+@pytest.fixture(scope='module')
+def state(storage, vessel):
+    return storage.get_voyage_state(vessel)
+
+def test_check_report_sequence(benchmark, history):
+    benchmark(logic.check_report_sequence, history, 'At Sea')
+
+def test_check_laden_ballast_change(benchmark, history):
+    benchmark(logic.check_laden_ballast_change, history, 'Laden', 'At Sea')
+
+def test_check_for_contradiction_full_dataset(benchmark, storage, vessel):
+    data = storage.get_data()
+    benchmark(logic.check_for_contradiction, vessel, 'Laden', 'At Sea', data)
+
+def test_voyage_state_from_history(benchmark, history):
+    benchmark(logic.VoyageState.from_history, history)
+
+def test_voyage_state_checks(benchmark, state):
+    benchmark(lambda: (
+        state.check_report_sequence('At Sea'),
+        state.check_laden_ballast_change('Laden', 'At Sea'),
+        state.check_for_contradiction('Laden', 'At Sea'),
+    ))
+
+def test_get_voyage_state(benchmark, storage, vessel):
+    benchmark(storage.get_voyage_state, vessel)
+
+def test_get_vessel_history(benchmark, storage, vessel):
+    benchmark(storage.get_vessel_history, vessel)
+
+def test_get_vessel_history_last_5(benchmark, storage, vessel):
+    benchmark(storage.get_vessel_history, vessel, 5)
+
+def test_query_one_vessel_30_days(benchmark, storage, vessel):
+    benchmark(storage.query, [vessel], date_from=date.today() - timedelta(days=30))
+
+def test_query_first_page(benchmark, storage):
+    benchmark(storage.query, limit=500)
+
+def test_get_data(benchmark, storage):
+    benchmark(storage.get_data)
+
+def test_add_entry_append(benchmark, storage, vessel, state):
+    # Last, since it grows the shared fleet
+    next_day = [date.today()]
+
+    def add_entry():
+        storage.add_entry({'Vessel_name': vessel, 'Date': next_day[0], 'Laden_Ballst': state.last_status, 'Report_Type': 'At Sea'})
+        next_day[0] += timedelta(days=1)
+
+    benchmark(add_entry)
@@ -0,0 +1,25 @@
+from collections import Counter
+
+from WebApp.audit import audit_summary, changed_vessels, run_audit
+from WebApp.storage import DataStorage
+
+def test_contradictions_are_warnings_and_counted_apart():
+    storage = DataStorage()
+    storage.add_entries([
+        {'Vessel_name': 'Audit Vessel', 'Date': f'2024-01-0{day}', 'Laden_Ballst': status, 'Report_Type': report_type}
+        for day, (status, report_type) in enumerate([
+            ('Laden', 'At Sea'), ('Laden', 'At Sea'), ('Laden', 'At Sea'), ('Laden', 'Arrival'),
+            ('Laden', 'Arrival At Berth'), ('Ballast', 'In Port'), ('Ballast', 'At Sea'),
+        ], 1)
+    ])
+    snapshot = storage.snapshot()
+    names = changed_vessels(snapshot)
+    findings = list(run_audit(snapshot, names))
+    # Discharging at berth only contradicts the Laden lookback; At Sea straight after breaks the sequence
+    assert [(f['date'], f['rule'], f['severity']) for f in findings if f['date'] == '2024-01-06'] == \
+        [('2024-01-06', 'status_contradiction', 'warning')]
+    assert any(f['date'] == '2024-01-07' and f['severity'] == 'violation' for f in findings)
+    severities = Counter(f['severity'] for f in findings)
+    summary = audit_summary(snapshot, names, severities, None)['summary']
+    assert (summary['violations'], summary['warnings']) == (severities['violation'], severities['warning'])
+    assert summary['violations'] + summary['warnings'] == len(findings)
@@ -0,0 +1,72 @@
+from datetime import date
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from WebApp.bulk_import import read_frame, validate_frame
+from WebApp.storage import DataStorage
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=['Vessel_name', 'Date', 'Laden_Ballst', 'Report_Type'])
+
+def by_row(reports):
+    return [(report['Date'], report['valid'], report['violations'], report['warnings']) for report in reports]
+
+@pytest.mark.parametrize('dates', [
+    ['2024-01-01T10:00:00+05:00', '2024-01-02'],
+    ['2024-01-01', '2024-01-02T10:00:00Z'],
+    ['2024-01-01T23:30:00+05:00', '2024-01-02T01:00:00-03:00'],
+])
+def test_mixed_offsets_keep_the_date_as_written(dates):
+    df = frame([('Import Vessel', d, 'Laden', 'At Sea') for d in dates])
+    reports, accepted, _ = validate_frame(df, DataStorage())
+    assert [report['Date'] for report in reports] == [date(2024, 1, 1), date(2024, 1, 2)]
+    assert all(report['valid'] for report in reports)
+    assert len(accepted) == 2
+
+def test_unparseable_date_is_a_row_violation():
+    df = frame([
+        ('Import Vessel', '2024-01-01T10:00:00+05:00', 'Laden', 'At Sea'),
+        ('Import Vessel', 'yesterday', 'Laden', 'At Sea'),
+        ('Import Vessel', '2024-01-03', 'Laden', 'At Sea'),
+    ])
+    reports, accepted, _ = validate_frame(df, DataStorage())
+    assert by_row(reports)[1] == (None, False, ["Missing or unrecognised date."], [])
+    assert [entry['Date'] for entry in accepted] == [date(2024, 1, 1), date(2024, 1, 3)]
+
+def test_rows_are_checked_against_the_stored_history():
+    storage = DataStorage()
+    storage.add_entries([
+        {'Vessel_name': 'Import Vessel', 'Date': '2024-01-01', 'Laden_Ballst': 'Laden', 'Report_Type': 'At Sea'},
+        {'Vessel_name': 'Import Vessel', 'Date': '2024-01-02', 'Laden_Ballst': 'Laden', 'Report_Type': 'Arrival'},
+    ])
+    csv = (b"Vessel_name,Date,Laden_Ballst,Report_Type\n"
+           b"Import Vessel,2024-01-03,Laden,Arrival At Berth\n"
+           b"Import Vessel,2024-01-04,Ballast,In Port\n"
+           b"Import Vessel,2024-01-05,Ballast,At Sea\n"
+           b"Import Vessel,2024-01-05,Ballast,Departure From Berth\n"
+           b"Other Vessel,2024-01-01,Full,At Sea\n")
+    reports, accepted, revisions = validate_frame(read_frame(csv, 'csv'), storage)
+    assert [report['valid'] for report in reports] == [True, True, False, True, False]
+    # The later row for 2024-01-05 supersedes the earlier one
+    assert reports[2]['violations'] == ["Superseded by a later row for the same vessel and date."]
+    assert reports[4]['violations'] == ["Laden/Ballast must be 'Laden' or 'Ballast'."]
+    assert [entry['Report_Type'] for entry in accepted] == ['Arrival At Berth', 'In Port', 'Departure From Berth']
+    assert revisions == {'Import Vessel': storage.snapshot().vessels['Import Vessel'].revision}
+
+def test_sequence_violation_is_rejected_and_contradiction_only_warned():
+    storage = DataStorage()
+    storage.add_entries([
+        {'Vessel_name': 'Import Vessel', 'Date': f'2024-01-0{day}', 'Laden_Ballst': 'Laden', 'Report_Type': report_type}
+        for day, report_type in enumerate(['At Sea', 'At Sea', 'At Sea', 'Arrival', 'Arrival At Berth'], 1)
+    ])
+    df = frame([
+        ('Import Vessel', '2024-01-06', 'Ballast', 'In Port'),
+        ('Import Vessel', '2024-01-07', 'Ballast', 'At Sea'),
+    ])
+    reports, accepted, _ = validate_frame(df, storage)
+    # Discharged at berth: allowed, but flagged against the Laden lookback
+    assert reports[0]['valid'] and reports[0]['violations'] == [] and len(reports[0]['warnings']) == 1
+    assert not reports[1]['valid'] and reports[1]['violations']
+    assert [entry['Date'] for entry in accepted] == [date(2024, 1, 6)]
@@ -0,0 +1,52 @@
+import pytest
+
+from WebApp.intent import classify_intent, resolve_locally
+
+# Replies that are safe to answer without the model, and the ones that must
+# be escalated because a local answer could save the wrong status.
+
+FALLBACK_QUESTION = ("There is a status change for **Navig8 Messi** on 2024-01-06.\n"
+                     "- New status: **Ballast**\n- Previous status: **Laden**\nIs this change correct?")
+REVIEW_QUESTION = "Hey Master, the status changed from Laden to Ballast. Would you like to review this change?"
+
+@pytest.mark.parametrize('text, last_bot_message, expected', [
+    ("proceed", REVIEW_QUESTION, ('proceed', None)),
+    ("go ahead", None, ('proceed', None)),
+    ("Ballast is right", FALLBACK_QUESTION, ('proceed', None)),
+    ("correct it to Laden", REVIEW_QUESTION, ('correct_status', 'Laden')),
+    ("it should be Laden", FALLBACK_QUESTION, ('correct_status', 'Laden')),
+    ("correct it", REVIEW_QUESTION, ('clarify', None)),
+])
+def test_resolved_locally(text, last_bot_message, expected):
+    action, corrected_status, confidence = classify_intent(text, last_bot_message, 'Ballast')
+    assert (action, corrected_status) == expected
+    assert confidence >= 0.9
+
+@pytest.mark.parametrize('text, last_bot_message', [
+    # Naming the previous status is not agreeing with the new one
+    ("Laden is right", FALLBACK_QUESTION),
+    ("Laden is right", None),
+    ("keep Laden", REVIEW_QUESTION),
+    # Answers to "Is this change correct?", not requests to correct it
+    ("correct", FALLBACK_QUESTION),
+    ("yes, correct", FALLBACK_QUESTION),
+    ("yes", REVIEW_QUESTION),
+    ("Laden and Ballast", None),
+    ("why was this flagged?", None),
+    ("no", FALLBACK_QUESTION),
+    # Mostly agreeable words around one that asks to undo the change
+    ("go ahead and revert", FALLBACK_QUESTION),
+    ("yes the old entry is right", FALLBACK_QUESTION),
+    ("yes go back", REVIEW_QUESTION),
+    ("go ahead and revert", None),
+    ("yes the old entry is right", None),
+    ("yes go back", None),
+])
+def test_escalated(text, last_bot_message):
+    assert classify_intent(text, last_bot_message, 'Ballast')[0] is None
+
+def test_resolve_locally_never_saves_the_status_the_user_rejected():
+    history = [{'role': 'bot', 'content': FALLBACK_QUESTION}, {'role': 'user', 'content': "Laden is right"}]
+    assert resolve_locally(history, 'Navig8 Messi', 'Ballast', 'At Sea') is None
+    history[-1]['content'] = "Ballast is right"
+    assert resolve_locally(history, 'Navig8 Messi', 'Ballast', 'At Sea')['action'] == 'proceed'
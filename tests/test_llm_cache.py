@@ -0,0 +1,38 @@
+import asyncio
+import json
+import time
+
+from WebApp.llm_cache import ResponseCache
+
+def write_cache(path, entries):
+    path.write_text(json.dumps(entries), encoding='utf-8')
+
+def test_restored_entries_keep_their_original_expiry(tmp_path):
+    path = tmp_path / 'cache.json'
+    now = time.time()
+    write_cache(path, {'old': ['a', now - 3590], 'new': ['b', now - 10], 'expired': ['c', now - 4000]})
+    cache = ResponseCache(ttl=3600, path=str(path))
+    assert sorted(cache._cache) == ['new', 'old']
+    # Eleven seconds on, only the entry saved ten seconds ago is still live
+    cache._cache.expire(now + 11)
+    assert sorted(cache._cache) == ['new']
+
+def test_misses_are_written_later_outside_the_lock(tmp_path, monkeypatch):
+    path = tmp_path / 'cache.json'
+    cache = ResponseCache(path=str(path), save_interval=0.1)
+    held = []
+    dump = json.dump
+    monkeypatch.setattr(json, 'dump', lambda *args, **kwargs: (held.append(cache._lock.locked()), dump(*args, **kwargs)))
+
+    async def make():
+        return 'value'
+
+    async def run():
+        for i in range(5):
+            await cache.get_or_create_async(f'key {i}', make)
+        assert held == []
+        await asyncio.sleep(0.5)
+
+    asyncio.run(run())
+    assert held == [False]
+    assert sorted(json.loads(path.read_text(encoding='utf-8'))) == [f'key {i}' for i in range(5)]
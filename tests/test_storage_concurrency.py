@@ -0,0 +1,100 @@
+import random
+import sys
+import threading
+from datetime import date, timedelta
+
+from WebApp.logic import REPORT_SEQUENCE, VoyageState
+from WebApp.storage import DataStorage
+
+# Writers upsert (appends, back-dated inserts and same-date updates) while
+# readers check that every Snapshot they grab is internally consistent.
+
+WRITERS = 4
+READERS = 4
+WRITES_PER_WRITER = 300
+VESSELS = [f'Stress Vessel {i}' for i in range(5)]
+START = date(2024, 1, 1)
+
+def state_fields(state):
+    return {name: getattr(state, name) for name in VoyageState.__slots__}
+
+def random_entry(rng):
+    return {
+        'Vessel_name': rng.choice(VESSELS),
+        'Date': (START + timedelta(days=rng.randint(0, 60))).isoformat(),
+        'Laden_Ballst': rng.choice(['Laden', 'Ballast']),
+        'Report_Type': rng.choice(REPORT_SEQUENCE),
+    }
+
+def check_snapshot(snapshot):
+    for vessel_name, history in snapshot.vessels.items():
+        rows, days, revs = history.rows, history.days, history.revs
+        assert len(days) == len(rows) and len(revs) == len(rows), vessel_name
+        assert list(days) == sorted(set(days)), vessel_name
+        assert [row.day for row in rows] == list(days), vessel_name
+        assert all(row.vessel == vessel_name for row in rows), vessel_name
+        if rows:
+            assert history.revision == max(revs) <= snapshot.revision, vessel_name
+        assert state_fields(history.state) == state_fields(VoyageState.from_history(rows)), vessel_name
+
+def test_snapshots_stay_consistent_under_concurrent_writes():
+    storage = DataStorage()
+    storage.initialize()
+    done = threading.Event()
+    errors = []
+    reads = []
+    written = []
+    base_revision = storage.revision
+
+    def writer(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(WRITES_PER_WRITER):
+                if rng.random() < 0.5:
+                    storage.add_entry(random_entry(rng))
+                    written.append(1)
+                else:
+                    entries = [random_entry(rng) for _ in range(rng.randint(2, 5))]
+                    storage.add_entries(entries)
+                    written.append(len(entries))
+        except BaseException as e:
+            errors.append(e)
+
+    def reader():
+        count = 0
+        last_revision = 0
+        try:
+            while not done.is_set():
+                snapshot = storage.snapshot()
+                assert snapshot.revision >= last_revision
+                last_revision = snapshot.revision
+                check_snapshot(snapshot)
+                count += 1
+        except BaseException as e:
+            errors.append(e)
+        reads.append(count)
+
+    interval = sys.getswitchinterval()
+    # Switch threads often so reads interleave with every step of a write
+    sys.setswitchinterval(1e-5)
+    try:
+        writers = [threading.Thread(target=writer, args=(seed,)) for seed in range(WRITERS)]
+        readers = [threading.Thread(target=reader) for _ in range(READERS)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert not errors, errors[0]
+    assert all(reads)
+    snapshot = storage.snapshot()
+    check_snapshot(snapshot)
+    # Every entry got its own revision and no write was lost
+    assert snapshot.revision == base_revision + sum(written)
+    revisions = [rev for history in snapshot.vessels.values() for rev in history.revs]
+    assert len(revisions) == len(set(revisions))
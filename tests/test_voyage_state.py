@@ -0,0 +1,104 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from WebApp.logic import (
+    REPORT_SEQUENCE, VoyageState, check_for_contradiction, check_laden_ballast_change, check_report_sequence,
+    next_valid_after,
+)
+from WebApp.storage import DataStorage
+
+# VoyageState must answer every check exactly as the history-scanning
+# functions do. Histories are random, but seeded so failures reproduce.
+
+STATUSES = ['Laden', 'Ballast']
+PROPOSED_REPORT_TYPES = REPORT_SEQUENCE + ['Noon']
+START = date(2024, 1, 1)
+
+def random_report_type(rng, history):
+    # Mostly follow the voyage sequence so the valid paths are exercised too
+    if history and rng.random() < 0.7:
+        last = next((row['Report_Type'] for row in reversed(history) if row['Report_Type'] != 'In Port'), None)
+        return rng.choice(next_valid_after(last) + (['In Port'] if last else []))
+    return rng.choice(REPORT_SEQUENCE)
+
+def random_status(rng, history):
+    if history and rng.random() < 0.8:
+        return history[-1]['Laden_Ballst']
+    return rng.choice(STATUSES)
+
+def random_history(rng, vessel_name='Test Vessel', max_len=12):
+    history = []
+    for i in range(rng.randint(0, max_len)):
+        history.append({
+            'Vessel_name': vessel_name,
+            'Date': START + timedelta(days=i),
+            'Laden_Ballst': random_status(rng, history),
+            'Report_Type': random_report_type(rng, history),
+        })
+    return history
+
+def assert_equivalent(state, history, data, vessel_name='Test Vessel'):
+    for report_type in PROPOSED_REPORT_TYPES:
+        assert state.check_report_sequence(report_type) == check_report_sequence(history, report_type), (history, report_type)
+        for status in STATUSES:
+            assert state.check_laden_ballast_change(status, report_type) == \
+                check_laden_ballast_change(history, status, report_type), (history, status, report_type)
+            assert state.check_for_contradiction(status, report_type) == \
+                check_for_contradiction(vessel_name, status, report_type, data), (history, status, report_type)
+
+def state_fields(state):
+    return {name: getattr(state, name) for name in VoyageState.__slots__}
+
+@pytest.mark.parametrize('seed', range(20))
+def test_state_matches_history_checks(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        history = random_history(rng)
+        # Rows of other vessels, shuffled in, must not affect the result
+        data = history + random_history(rng, 'Other Vessel')
+        rng.shuffle(data)
+        assert_equivalent(VoyageState.from_history(history), history, data)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_advance_matches_every_prefix(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        history = random_history(rng, max_len=20)
+        state = VoyageState()
+        for i, row in enumerate(history):
+            state = state.advance(row)
+            prefix = history[:i + 1]
+            assert state_fields(state) == state_fields(VoyageState.from_history(prefix))
+            assert_equivalent(state, prefix, prefix)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_storage_state_after_backdated_inserts_and_updates(seed):
+    rng = random.Random(seed)
+    storage = DataStorage()
+    vessels = [f'Test Vessel {i}' for i in range(3)]
+    for _ in range(60):
+        entries = []
+        for _ in range(rng.randint(1, 4)):
+            vessel_name = rng.choice(vessels)
+            history = list(storage.get_vessel_history(vessel_name))
+            # Append, back-date or overwrite an existing date
+            day = rng.randint(0, len(history) + 1)
+            entries.append({
+                'Vessel_name': vessel_name,
+                'Date': (START + timedelta(days=day)).isoformat(),
+                'Laden_Ballst': random_status(rng, history),
+                'Report_Type': random_report_type(rng, history),
+            })
+        if len(entries) == 1:
+            storage.add_entry(entries[0])
+        else:
+            storage.add_entries(entries)
+        data = storage.get_data()
+        for vessel_name in vessels:
+            history = list(storage.get_vessel_history(vessel_name))
+            assert [row['Date'] for row in history] == sorted({row['Date'] for row in history})
+            state = storage.get_voyage_state(vessel_name)
+            assert state_fields(state) == state_fields(VoyageState.from_history(history))
+            assert_equivalent(state, history, data, vessel_name)